@@ -0,0 +1,69 @@
+"""compares sampled color extraction against the full image statistics it replaced, on a large GIF avatar
+
+the decoded rows are what the commands pass, as avatars go through the avatar cache and flags are opened first;
+run from the repository root: python -m benchmarks.dominant_color"""
+import random
+import timeit
+from io import BytesIO
+
+from PIL import Image, ImageStat
+
+from cogs.imaging.color import dominant_color, ALGORITHMS
+
+SIZE = (1024, 1024)
+FRAMES = 8
+
+
+def find_mean_color_full(image):
+    if not isinstance(image, Image.Image):
+        image = Image.open(BytesIO(image))
+
+    image = image.convert("RGB")
+
+    stat = ImageStat.Stat(image)
+
+    return [int(i) for i in stat.median]
+
+
+def random_gif():
+    frames = []
+
+    for _ in range(FRAMES):
+        noise = Image.effect_noise(SIZE, 64).convert("RGB")
+        tint = Image.new("RGB", SIZE, tuple(random.randrange(256) for _ in range(3)))
+        frames.append(Image.blend(noise, tint, 0.5).quantize(256))
+
+    io = BytesIO()
+    frames[0].save(io, "GIF", save_all=True, append_images=frames[1:], duration=50, loop=0)
+    return io.getvalue()
+
+
+def decoded(data):
+    image = Image.open(BytesIO(data))
+    image.load()
+    return image
+
+
+def main():
+    data = random_gif()
+    print(f"{len(data) / 1024:.0f}KiB {SIZE[0]}x{SIZE[1]} GIF, {FRAMES} frames")
+
+    inputs = {
+        "encoded": data,
+        "decoded frame": decoded(data),
+        "decoded RGB": decoded(data).convert("RGB"),
+    }
+
+    for name, image in inputs.items():
+        full = min(timeit.repeat(lambda: find_mean_color_full(image), number=5, repeat=3)) / 5
+        print(f"{name}:\n{'full median':>16} {full * 1000:>8.2f}ms {find_mean_color_full(image)}")
+
+        for algorithm in ALGORITHMS:
+            sampled = min(timeit.repeat(lambda: dominant_color(image, algorithm), number=5, repeat=3)) / 5
+
+            print(f"{'sampled ' + algorithm:>16} {sampled * 1000:>8.2f}ms {dominant_color(image, algorithm)} "
+                  f"({full / sampled:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""compares stitch_flags and its cached band masks against the polygon mask implementation it replaced
+
+run from the repository root: python -m benchmarks.stitch_flags"""
+import random
+import timeit
+
+from PIL import Image
+from PIL.ImageDraw import ImageDraw
+
+from cogs.imaging.resize import center_resize, stitch_flags
+
+SIZE = (512, 512)
+
+
+def stitch_flags_drawn(size, *flags: Image):
+    mask = Image.new("L", size, 0)
+    ret = Image.new("RGB", size, (0, 0, 0))
+
+    mask_drawer = ImageDraw(mask)
+
+    spacing = 1 / (len(flags) - 1) * size[0]
+
+    def generate_point_for_idx(index):
+        return index * spacing, size[1] if index % 2 == 0 else 0
+
+    for idx, flag in enumerate(flags):
+        points = [*generate_point_for_idx(idx - 1), *generate_point_for_idx(idx), *generate_point_for_idx(idx + 1)]
+
+        mask_drawer.polygon(points, 255)
+
+        flag = center_resize(flag, *size)
+
+        ret.paste(flag, mask=mask)
+
+        mask_drawer.rectangle((0, 0) + mask.size, 0)  # clear
+
+    return ret
+
+
+def random_flag():
+    return Image.new("RGB", (random.randint(300, 1200), random.randint(200, 800)),
+                     tuple(random.randrange(256) for _ in range(3)))
+
+
+def main():
+    print(f"{'flags':>5} {'drawn':>10} {'banded':>12} {'speedup':>8}")
+
+    for count in range(2, 11):
+        flags = [random_flag() for _ in range(count)]
+
+        # the first call fills the mask cache, like any request after the first with this shape
+        stitch_flags(SIZE, *flags)
+
+        drawn = min(timeit.repeat(lambda: stitch_flags_drawn(SIZE, *flags), number=5, repeat=3)) / 5
+        banded = min(timeit.repeat(lambda: stitch_flags(SIZE, *flags), number=5, repeat=3)) / 5
+
+        print(f"{count:>5} {drawn * 1000:>8.2f}ms {banded * 1000:>10.2f}ms {drawn / banded:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
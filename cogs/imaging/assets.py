@@ -0,0 +1,56 @@
+import os
+import typing
+
+from PIL import Image
+
+from etcetra.sized_lru_cache import SizedLRUCache
+
+
+def image_size(image: Image.Image):
+    return image.width * image.height * len(image.getbands())
+
+
+class AssetManager:
+    """bundled images loaded once, plus a small cache of resized variants
+
+    every image handed out is shared between callers and should not be modified in place"""
+
+    def __init__(self, directory, *, variant_budget=16 * 1024 * 1024):
+        self.directory = directory
+
+        self._originals: typing.Dict[str, Image.Image] = {}
+        self._variants = SizedLRUCache(variant_budget, sizeof=image_size)
+
+    def load(self):
+        for file in os.listdir(self.directory):
+            with Image.open(os.path.join(self.directory, file)) as image:
+                image.load()
+                self._originals[file] = image.copy()
+
+    def get(self, name) -> Image.Image:
+        return self._originals[name]
+
+    def resized(self, name, size, mode=None) -> Image.Image:
+        key = (name, tuple(size), mode)
+        variant = self._variants.get(key)
+
+        if variant is None:
+            variant = self.get(name)
+
+            if mode is not None:
+                variant = variant.convert(mode)
+
+            variant = variant.resize(size)
+            self._variants.put(key, variant)
+
+        return variant
+
+    def constant(self, mode, size, color) -> Image.Image:
+        key = (None, tuple(size), mode, color)
+        variant = self._variants.get(key)
+
+        if variant is None:
+            variant = Image.new(mode, size, color)
+            self._variants.put(key, variant)
+
+        return variant
@@ -0,0 +1,95 @@
+import os
+import typing
+from io import BytesIO
+from urllib.parse import urlsplit, parse_qs
+
+import nextcord
+from PIL import Image
+
+from cogs.imaging.assets import image_size
+from cogs.imaging.color import dominant_color
+from cogs.imaging.executor import execute
+from etcetra.disk_cache import DiskCache
+from etcetra.sized_lru_cache import SizedLRUCache
+
+MEGABYTE = 1024 * 1024
+
+ImageSource = typing.Union[nextcord.Asset, nextcord.Attachment]
+
+
+def source_key(source: ImageSource) -> str:
+    """avatar urls change with the avatar hash and attachments never change, so neither needs invalidating"""
+    if isinstance(source, nextcord.Attachment):
+        return f"attachment-{source.id}"
+
+    url = urlsplit(source.url)
+    size = parse_qs(url.query).get("size", ["default"])[0]
+    _, extension = os.path.splitext(url.path)
+
+    return f"{source.key}-{size}{extension}"
+
+
+def _decode(data: bytes) -> Image.Image:
+    image = Image.open(BytesIO(data))
+    # the first frame is enough for sizes and colors
+    image.load()
+
+    return image
+
+
+class AvatarCache:
+    """downloaded avatars and attachments, their decoded first frames and their median colors
+
+    bytes live in memory and, when a directory is given, spill to disk so they survive restarts"""
+
+    def __init__(self, *, memory_budget=32 * MEGABYTE, decoded_budget=64 * MEGABYTE,
+                 directory=None, disk_budget=256 * MEGABYTE, max_colors=4096):
+        self.memory = SizedLRUCache(memory_budget)
+        self.decoded = SizedLRUCache(decoded_budget, sizeof=image_size)
+        self.colors = SizedLRUCache(max_colors, sizeof=lambda _: 1)
+        self.disk = None if directory is None else DiskCache(directory, disk_budget)
+
+    async def read(self, source: ImageSource) -> bytes:
+        key = source_key(source)
+        data = self.memory.get(key)
+
+        if data is not None:
+            return data
+
+        if self.disk is not None:
+            data = await execute(self.disk.get, key)
+
+        if data is None:
+            data = await source.read()
+
+            if self.disk is not None:
+                await execute(self.disk.put, key, data)
+
+        self.memory.put(key, data)
+        return data
+
+    async def open(self, source: ImageSource) -> typing.Tuple[bytes, Image.Image]:
+        """the raw bytes with the decoded image, which is shared and should not be modified in place"""
+        key = source_key(source)
+        data = await self.read(source)
+        image = self.decoded.get(key)
+
+        if image is None:
+            image = await execute(_decode, data)
+            self.decoded.put(key, image)
+
+        return data, image
+
+    async def color(self, source: ImageSource) -> typing.List[int]:
+        key = source_key(source)
+        color = self.colors.get(key)
+
+        if color is None:
+            _, image = await self.open(source)
+            color = await execute(dominant_color, image)
+            self.colors.put(key, color)
+
+        return color
+
+
+avatar_cache = AvatarCache(directory=os.getenv("avatar_cache_dir"))
@@ -3,23 +3,27 @@ import datetime
 import os
 from io import BytesIO
 
-import aiohttp
 import nextcord
-from PIL import Image, ImageStat
-from nextcord.ext import commands
+from nextcord.ext import commands, tasks
 
+from etcetra import instrumentation
+from etcetra.http_client import client
 from etcetra.interops import CommandInterop
-from .command import generic_flag_command, stitch_flags, execute_scene
-from .executor import execute
+from .assets import AssetManager
+from .avatar_cache import avatar_cache
+from .color import dominant_color
+from .command import generic_flag_command, stitch_flags, render_when_admitted
+from .executor import execute, render_engine
 from etcetra.flag_retriever.exceptions import FlagOpenError
-from etcetra.flag_retriever import Flag
+from etcetra.flag_retriever import Flag, open_flags, refresh_retrievers
+from .render_cache import RenderCache
 from .resize import center_resize
-from .scenery import FlagOverlayScene, HelicopterScene
+from .scheduler import RenderScheduler
+from etcetra.scenery import FlagOverlaySceneDescription, HelicopterSceneDescription
 
 
 async def retrieve(url):
-    async with aiohttp.request("GET", url) as image_response:
-        return await image_response.read()
+    return await client.read(url)
 
 
 def to_io(image):
@@ -29,66 +33,99 @@ def to_io(image):
     return output_buffer
 
 
-def asset_path(name):
+def asset_path(name=None):
     self_dir = os.path.dirname(__file__)
-    return os.path.join(self_dir, 'assets', name)
+    if name is None:
+        return os.path.join(self_dir, 'assets')
+    else:
+        return os.path.join(self_dir, 'assets', name)
 
 
 class BadImageInput(Exception):
     pass
 
 
-def find_mean_color(image):
-    if not isinstance(image, Image.Image):
-        image = Image.open(BytesIO(image))
-
-    image = image.convert("RGB")
-
-    stat = ImageStat.Stat(image)
-
-    return [int(i) for i in stat.median]
-
-
 class Imaging(commands.Cog):
     def __init__(self, bot):
         self.bot: commands.Bot = bot
         self.loop = asyncio.get_event_loop()
 
         self.cooldown_mapping = commands.CooldownMapping.from_cooldown(1, 20.0, commands.BucketType.user)
-        self.execution_semaphore = asyncio.Semaphore(2)
+        self.render_scheduler = RenderScheduler(render_engine.workers)
+        self.render_cache = RenderCache(directory=os.getenv("render_cache_dir"))
+
+        self.assets = AssetManager(asset_path())
+        self.assets.load()
+
+        render_engine.start()
+        self.refresh_flags.start()
+        self.log_load.start()
+
+    def cog_unload(self):
+        render_engine.shutdown()
+        self.refresh_flags.cancel()
+        self.log_load.cancel()
+
+    @tasks.loop(minutes=10)
+    async def refresh_flags(self):
+        await refresh_retrievers()
+
+    def render_load(self):
+        scheduler = self.render_scheduler
+        return f"renders {scheduler.running}/{scheduler.slots} running {scheduler.queued} queued"
+
+    @tasks.loop(minutes=5)
+    async def log_load(self):
+        print(f"load: {instrumentation.summary_line()}, {self.render_load()}")
+
+    @commands.is_owner()
+    @commands.command(name="load")
+    async def show_load(self, ctx):
+        """shows event loop lag, executor saturation and render queue"""
+        await ctx.send(f"```\n{instrumentation.report()}\n{self.render_load()}\n```")
 
     async def cog_before_invoke(self, ctx):
+        if ctx.command is self.show_load:
+            # owner diagnostics shouldn't be rate limited like renders
+            return
+
         bucket = self.cooldown_mapping.get_bucket(ctx.message)
         retry_after = bucket.update_rate_limit()
         if retry_after:
             raise commands.CommandOnCooldown(bucket, bucket.per, commands.BucketType.user)
 
     @generic_flag_command("circle")
-    def flag_executor(self, user, flag, *, rotate, fps):
+    def flag_executor(self, user, user_bin, flag, *, rotate, fps):
         """retrieves a flag and returns your profile picture with it in the edge"""
         flag = center_resize(flag, *user.size)
-        edge = Image.open(asset_path("profile_edge.png")).resize(user.size).convert('L')
+        edge = self.assets.resized("profile_edge.png", user.size, 'L')
 
-        return FlagOverlayScene(user, edge, flag, rotate=rotate, fps=fps)
+        return FlagOverlaySceneDescription(user_bin, edge, flag, rotate=rotate, fps=fps)
 
     @generic_flag_command("overlay")
-    def overlay_executor(self, user, flag, *, rotate, fps):
+    def overlay_executor(self, user, user_bin, flag, *, rotate, fps):
         """retrieves a flag and overlays it over your profile picture"""
         flag = center_resize(flag, *user.size)
         flag = flag.resize((int(flag.size[0] * 1.5), int(flag.size[1] * 1.5)))
-        mask = Image.new('L', user.size, 128)
+        mask = self.assets.constant('L', user.size, 128)
 
-        return FlagOverlayScene(user, mask, flag, rotate=rotate, fps=fps)
+        return FlagOverlaySceneDescription(user_bin, mask, flag, rotate=rotate, fps=fps)
 
     @commands.group(name="helicopter", invoke_without_command=True)
     async def helicopter(self, ctx: commands.Context):
-        user_bin = await ctx.author.avatar.read()
-        user = await execute(Image.open, BytesIO(user_bin))
+        user_bin = await avatar_cache.read(ctx.author.display_avatar)
         resp = CommandInterop.from_command(ctx)
-        io, animated = await execute_scene(resp, HelicopterScene(user))
-        io.seek(0)
-        await resp.respond(content="Render complete",
-                           file=nextcord.File(io, f"output.{'gif' if animated else 'png'}"))
+        path, animated = await render_when_admitted(resp, self, HelicopterSceneDescription(user_bin))
+
+        if path is None:
+            return
+
+        try:
+            await resp.respond(content="Render complete",
+                               file=nextcord.File(path, f"output.{'gif' if animated else 'png'}"))
+
+        finally:
+            os.remove(path)
 
     @commands.group(name="flag", invoke_without_command=True)
     async def show_flag(self, ctx: commands.Context, *, flag: Flag):
@@ -101,7 +138,7 @@ class Imaging(commands.Cog):
                 await ctx.send(f"Cannot open flag {flag.name} in url <{flag.safe_url}> as {str(e)}")
                 return
 
-            pix = await execute(find_mean_color, opened_flag)
+            pix = await execute(dominant_color, opened_flag)
 
             io = await execute(to_io, opened_flag)
 
@@ -124,26 +161,19 @@ class Imaging(commands.Cog):
                 await ctx.send(f"insufficient flags:\n{listing}")
                 return
 
-            opened_flags = []
-            flags_url = {}
+            opened_flags = await open_flags(flags)
 
-            for flag in flags:
-                if flag.url in flags_url:
-                    opened_flags.append(flags_url[flag.url])
-                else:
-                    try:
-                        image = await flag.open()
+            failures = [f"Cannot open flag {flag.name} in url <{flag.safe_url}> as {str(result)}"
+                        for flag, result in zip(flags, opened_flags) if isinstance(result, FlagOpenError)]
 
-                    except FlagOpenError as e:
-                        await ctx.send(f"Cannot open flag {flag.name} in url <{flag.safe_url}> as {str(e)}")
-
-                    opened_flags.append(image)
-                    flags_url[flag.url] = image
+            if failures:
+                await ctx.send("\n".join(failures))
+                return
 
             try:
                 stitched_flag = await execute(stitch_flags, opened_flags[0].size, *opened_flags)
 
-                pix = await execute(find_mean_color, stitched_flag)
+                pix = await execute(dominant_color, stitched_flag)
 
                 # little hack to avoid writing function
                 io = await execute(to_io, stitched_flag)
@@ -159,11 +189,10 @@ class Imaging(commands.Cog):
     async def avatar(self, ctx, target: nextcord.User = None):
         target = ctx.author if target is None else target
 
-        asset = target.avatar_url_as()
-        user_bin = await asset.read()
+        asset = target.display_avatar
 
         try:
-            pix = await execute(find_mean_color, user_bin)
+            pix = await avatar_cache.color(asset)
         except BadImageInput:
             # given that it's from nextcord, it should not come here
             # because pillow would theoretically support it
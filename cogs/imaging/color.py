@@ -0,0 +1,68 @@
+import os
+import typing
+from io import BytesIO
+
+from PIL import Image, ImageStat
+
+# statistics of a few thousand pixels are indistinguishable from those of the whole image for an embed color
+SAMPLE_SIZE = 64
+
+ALGORITHMS = ("median", "mean", "kmeans")
+
+# modes Image.reduce averages; anything else, palettes included, is sampled with nearest neighbour instead
+REDUCIBLE_MODES = ("RGB", "RGBA", "L", "LA")
+
+
+def sample(image: Image.Image, size=SAMPLE_SIZE) -> Image.Image:
+    """a small RGB version of the image, shrunk by an integer factor before any conversion"""
+    factor = min(image.width, image.height) // size
+
+    if factor > 1:
+        if image.mode in REDUCIBLE_MODES:
+            image = image.reduce(factor)
+
+        else:
+            # only reads the pixels it keeps, where converting first would go over every pixel
+            image = image.resize((image.width // factor, image.height // factor), Image.NEAREST)
+
+    return image.convert("RGB")
+
+
+def _median(image):
+    return ImageStat.Stat(image).median
+
+
+def _mean(image):
+    return ImageStat.Stat(image).mean
+
+
+def _kmeans(image, clusters=5):
+    # the most populated cluster of a small k-means palette
+    palette_image = image.quantize(clusters, method=Image.FASTOCTREE, kmeans=2)
+    _, index = max(palette_image.getcolors(clusters))
+    palette = palette_image.getpalette()
+
+    return palette[index * 3:index * 3 + 3]
+
+
+_extractors = {
+    "median": _median,
+    "mean": _mean,
+    "kmeans": _kmeans,
+}
+
+
+def dominant_color(image: typing.Union[bytes, Image.Image], algorithm=None) -> typing.List[int]:
+    """an RGB color representing the image; the algorithm defaults to $color_algorithm, or median
+
+    nothing is memoized here, hashing the image would cost more than sampling it; callers that see the same image
+    again key it themselves, as AvatarCache does by asset"""
+    algorithm = algorithm or os.getenv("color_algorithm", "median")
+
+    if algorithm not in _extractors:
+        raise ValueError(f"unknown color algorithm {algorithm}, expected one of {', '.join(ALGORITHMS)}")
+
+    if not isinstance(image, Image.Image):
+        image = Image.open(BytesIO(image))
+
+    return [int(i) for i in _extractors[algorithm](sample(image))]
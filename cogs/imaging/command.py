@@ -1,27 +1,54 @@
 import asyncio
-import difflib
 import inspect
+import os
 import typing
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
 from typing import TYPE_CHECKING
 
 import nextcord
-from PIL import Image
 from nextcord import Interaction, SlashOption
 from nextcord.ext import commands
-from render.execute import run_scene
-
-from cogs.imaging.executor import execute
-from etcetra.flag_retriever import Flag, search
+from cogs.imaging.avatar_cache import avatar_cache
+from cogs.imaging.executor import execute, render_engine, RenderTooLarge, UPLOAD_LIMIT
+from cogs.imaging.quality import quality_ladder
+from cogs.imaging.render_cache import RenderCache
+from cogs.imaging.scheduler import QueueFull
+from etcetra.flag_retriever import Flag, open_flags, search_index
 from etcetra.flag_retriever.exceptions import FlagOpenError
-from cogs.imaging.resize import stitch_flags, try_get_image
-from cogs.imaging.scenery import RotateDirection
+from cogs.imaging.resize import stitch_flags, find_image_source
+from etcetra.scenery import Quality, RotateDirection, SceneCost, SceneDescription
 from etcetra.interops import CommandInterop, TraditionalCommandInterop
 
 if TYPE_CHECKING:
     from cogs.imaging import Imaging
 
 
+def open_for_source(source, flags: typing.Sequence[Flag]) -> typing.Tuple[asyncio.Task, asyncio.Task]:
+    """starts reading and decoding the avatar and opening the flags at its size, downloading them meanwhile"""
+    avatar = asyncio.ensure_future(avatar_cache.open(source))
+
+    async def avatar_size():
+        _, image = await asyncio.shield(avatar)
+        return image.size
+
+    size = asyncio.ensure_future(avatar_size())
+    # the flags only await it through shields, a failed avatar is reported through the avatar task instead
+    size.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    return avatar, asyncio.ensure_future(open_flags(flags, size=size))
+
+
+def discard(task: asyncio.Future):
+    """cancels a task nobody will await anymore, retrieving its exception if it already failed"""
+    if task.done():
+        if not task.cancelled():
+            task.exception()
+
+    else:
+        task.cancel()
+
+
 def generic_flag_command(name):
     def wrapper(func):
         async def impl_command(resp: CommandInterop,
@@ -35,10 +62,30 @@ def generic_flag_command(name):
                 await resp.respond(f"no flags provided", failure=True)
                 return
 
-            if cog.execution_semaphore.locked():
-                await resp.respond("Awaiting for slots")
+            avatar = opening = None
+
+            try:
+                async with resp.loading():
+                    if isinstance(resp, TraditionalCommandInterop):
+                        source = await find_image_source(resp.ctx, user)
+
+                    else:
+                        source = user.display_avatar
+
+                    # flags download alongside the avatar and rasterize at its size while the render cache is consulted
+                    avatar, opening = open_for_source(source, flags)
+                    user_bin, _ = await asyncio.shield(avatar)
+
+                    cache_key = RenderCache.key(name, user_bin, *(flag.url for flag in flags),
+                                                rotate=rotate.name, fps=fps)
+                    cached = await cog.render_cache.get(cache_key)
+
+                if cached is not None:
+                    data, animated = cached
+                    await resp.respond(content="Render complete",
+                                       file=nextcord.File(BytesIO(data), f"output.{'gif' if animated else 'png'}"))
+                    return
 
-            async with cog.execution_semaphore:
                 using_chunk = resp.chunk()
 
                 if len(flags) == 1:
@@ -49,30 +96,15 @@ def generic_flag_command(name):
                     await using_chunk.set(f"using:\n{listing}")
 
                 async with resp.loading():
-                    opened_flags = []
-                    flags_url = {}
-
-                    for flag in flags:
-                        if flag.url in flags_url:
-                            opened_flags.append(flags_url[flag.url])
-                        else:
-                            try:
-                                image = await flag.open()
+                    _, user = await avatar
+                    opened_flags = await opening
 
-                            except FlagOpenError as e:
-                                await resp.respond(f"Cannot open flag {flag.name} in url <{flag.url}> as {str(e)}")
-                                return
+                    failures = [f"Cannot open flag {flag.name} in url <{flag.url}> as {str(result)}"
+                                for flag, result in zip(flags, opened_flags) if isinstance(result, FlagOpenError)]
 
-                            opened_flags.append(image)
-                            flags_url[flag.url] = image
-
-                    if isinstance(resp, TraditionalCommandInterop):
-                        user_bin = await try_get_image(resp.ctx, user)
-
-                    else:
-                        user_bin = await user.avatar.read()
-
-                    user = await execute(Image.open, BytesIO(user_bin))
+                    if failures:
+                        await resp.respond("\n".join(failures))
+                        return
 
                     if len(opened_flags) == 1:
                         stitched_flag = opened_flags[0]
@@ -80,14 +112,36 @@ def generic_flag_command(name):
                     else:
                         stitched_flag = await execute(stitch_flags, user.size, *opened_flags)
 
-                    scene = await execute(func, cog, user, stitched_flag, rotate=rotate, fps=fps)
-                    io, animated = await execute_scene(resp, scene)
+                    scene = await execute(func, cog, user, user_bin, stitched_flag, rotate=rotate, fps=fps)
+                    cost = await execute(scene.estimate_cost)
+
+                    # nothing moves, so a single composite replaces the render queue and the scene
+                    still = None if cost.animated else await execute(scene.render_still)
+
+                if still is not None and len(still) <= UPLOAD_LIMIT:
+                    using_chunk.remove()
 
-                    if io is not None:
-                        io.seek(0)
-                        using_chunk.remove()
+                    await resp.respond(content="Render complete", file=nextcord.File(BytesIO(still), "output.png"))
+                    await cog.render_cache.put(cache_key, still, False)
+                    return
+
+                path, animated = await render_when_admitted(resp, cog, scene, cost)
+
+                if path is not None:
+                    using_chunk.remove()
+
+                    try:
                         await resp.respond(content="Render complete",
-                                           file=nextcord.File(io, f"output.{'gif' if animated else 'png'}"))
+                                           file=nextcord.File(path, f"output.{'gif' if animated else 'png'}"))
+
+                    finally:
+                        # takes ownership of the file
+                        await cog.render_cache.put_file(cache_key, path, animated)
+
+            finally:
+                for task in (avatar, opening):
+                    if task is not None:
+                        discard(task)
 
         async def c_single(self, ctx, user: typing.Optional[nextcord.Member], *, flag: Flag):
             await impl_command(CommandInterop.from_command(ctx), self, user, flag)
@@ -131,13 +185,9 @@ def generic_flag_command(name):
 
             if ":" in current:
                 chunks = current.split(":", maxsplit=1)
-                ret = await search(chunks[1], chunks[0])
-                ret = set(f"{chunks[0]}:{res}" for res in ret)
+                ret = [f"{chunks[0]}:{res}" for res in search_index.search(chunks[1], chunks[0].strip())]
             else:
-                ret = await search(current.strip())
-
-            ret = list(ret)
-            ret.sort(key=lambda x: difflib.SequenceMatcher(None, x, current).ratio(), reverse=True)
+                ret = search_index.search(current)
 
             if len(split) == 2:
                 ret = list(split[0] + "," + res for res in ret)
@@ -158,8 +208,34 @@ def generic_flag_command(name):
     return wrapper
 
 
-async def execute_scene(resp: CommandInterop, scene) -> typing.Union[typing.Tuple[None, None],
-                                                                     typing.Tuple[BytesIO, float]]:
+async def render_when_admitted(resp: CommandInterop, cog: "Imaging", scene: SceneDescription,
+                               cost: SceneCost = None) -> \
+        typing.Union[typing.Tuple[None, None], typing.Tuple[str, bool]]:
+    """waits in the render queue with live position updates, then renders the scene"""
+    if cost is None:
+        cost = await execute(scene.estimate_cost)
+
+    guild = getattr(resp.channel, "guild", None)
+    queue_chunk = resp.chunk()
+
+    async def on_position(position, ahead):
+        await queue_chunk.set(f"Awaiting for slots (position {position} in queue)")
+
+    try:
+        async with cog.render_scheduler.slot(0 if guild is None else guild.id, resp.author.id,
+                                             cost.units(Quality()), on_position=on_position):
+            queue_chunk.remove()
+
+            async with resp.loading():
+                return await execute_scene(resp, scene, cost)
+
+    except QueueFull as e:
+        await queue_chunk.set(f"Cannot render right now as {str(e)}, try again later")
+        return None, None
+
+
+async def execute_scene(resp: CommandInterop, scene: SceneDescription, cost: SceneCost = None) -> \
+        typing.Union[typing.Tuple[None, None], typing.Tuple[str, bool]]:
     execution_chunk = resp.chunk()
 
     loop = asyncio.get_running_loop()
@@ -167,11 +243,9 @@ async def execute_scene(resp: CommandInterop, scene) -> typing.Union[typing.Tupl
 
     can_send = True
 
-    async def update(io: BytesIO, t):
-        nonlocal can_send
-
-        mb = len(io.getbuffer()) / 1024 / 1024
-        bar_size = int(mb / 8 * 20)
+    async def update(size, t):
+        mb = size / 1024 / 1024
+        bar_size = min(int(mb / 8 * 20), 20)
         details = [
             f"Size: {round(mb, 4)}MB `[{bar_size * '▓' + (20 - bar_size) * '░'}]`",
             f"Frame Second: {round(t, 2)}s"
@@ -180,30 +254,47 @@ async def execute_scene(resp: CommandInterop, scene) -> typing.Union[typing.Tupl
 
         await execution_chunk.set(f"Rendering Image...\n{d}")
 
-    def callback(io, t):
+    def report(size, t):
         nonlocal can_send
 
         if can_send:
             can_send = False
-            loop.create_task(update(io, t))
+            loop.create_task(update(size, t))
             loop.call_later(1, deexhaust)
 
-        return len(io.getbuffer()) / 1024 / 1024 < 8
-
     def deexhaust():
         nonlocal can_send
         can_send = True
 
-    future = execute(run_scene, scene, callback=callback)
+    if cost is None:
+        cost = await execute(scene.estimate_cost)
 
-    try:
-        ret = await future
+    # only the size limit steps down the ladder; anything else, a dead worker included, propagates
+    for quality in quality_ladder.plan(scene, cost, UPLOAD_LIMIT):
+        reached = 0
 
-    except RuntimeError:
-        await execution_chunk.set("File has grown too big")
-        scene.cleanup_objects()
-        return None, None
+        def progress(size, t):
+            nonlocal reached
+            reached = t
+            report(size, t)
 
-    else:
-        execution_chunk.remove()
-        return ret
+        try:
+            path, animated = await render_engine.render(scene.with_quality(quality), progress=progress)
+
+        except BrokenProcessPool:
+            # the engine has already replaced the dead worker, retrying lower qualities here would be pointless;
+            # the queue chunk is gone by now, so the rendering chunk carries the error
+            await execution_chunk.set("The renderer crashed while working on this, try again")
+            return None, None
+
+        except RenderTooLarge:
+            quality_ladder.record_overflow(scene, cost, quality, UPLOAD_LIMIT, reached)
+            await execution_chunk.set(f"File has grown too big at {quality}, trying a lower quality...")
+
+        else:
+            quality_ladder.record(scene, cost, quality, os.path.getsize(path))
+            execution_chunk.remove()
+            return path, animated
+
+    await execution_chunk.set("File has grown too big")
+    return None, None
@@ -1,17 +1,147 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import itertools
+import multiprocessing
+import os
+import threading
 import typing
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from functools import partial
 from typing import TYPE_CHECKING
 
+from etcetra.instrumentation import track_executor
+from etcetra.render_worker import RenderTooLarge, warm_up, ping, render_job
+
 if TYPE_CHECKING:
-    pass
+    from etcetra.scenery import SceneDescription
+
+# light glue work (decoding headers, resizing flags, building descriptions) stays on threads
+thread_pool = ThreadPoolExecutor(2)
+thread_pool_stats = track_executor("imaging threads")
 
-process_pool = ThreadPoolExecutor(2)
+UPLOAD_LIMIT = 8 * 1024 * 1024
 
 
 def execute(func, *args, **kwargs):
     loop = asyncio.get_running_loop()
-    return loop.run_in_executor(process_pool, partial(func, *args, **kwargs))
+    return thread_pool_stats.run_in_executor(loop, thread_pool, partial(func, *args, **kwargs),
+                                             getattr(func, "__qualname__", None))
+
+
+def _discard_output(future: asyncio.Future):
+    if future.cancelled():
+        return
+
+    if future.exception() is None:
+        path, _ = future.result()
+
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+class RenderEngine:
+    def __init__(self, workers=None, *, progress_interval=0.5):
+        self.workers = workers or int(os.getenv("render_workers", 2))
+        self.progress_interval = progress_interval
+
+        self._pool: typing.Optional[ProcessPoolExecutor] = None
+        self._queue: typing.Optional[multiprocessing.Queue] = None
+        self._listener: typing.Optional[threading.Thread] = None
+
+        self._jobs = {}
+        self._job_ids = itertools.count()
+
+    @property
+    def running(self):
+        return self._pool is not None
+
+    def start(self):
+        if self._pool is not None:
+            return
+
+        # spawn instead of fork; the parent holds gateway sockets and a running event loop
+        context = multiprocessing.get_context("spawn")
+
+        self._queue = context.Queue()
+        self._pool = ProcessPoolExecutor(self.workers, mp_context=context,
+                                         initializer=warm_up, initargs=(self._queue,))
+
+        self._listener = threading.Thread(target=self._listen, args=(self._queue,),
+                                          name="render-progress", daemon=True)
+        self._listener.start()
+
+        for _ in range(self.workers):
+            # workers are otherwise spawned lazily on the first render
+            self._pool.submit(ping)
+
+    def shutdown(self):
+        if self._pool is None:
+            return
+
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._queue.put(None)
+
+        self._pool = None
+        self._queue = None
+        self._listener = None
+        self._jobs.clear()
+
+    def _listen(self, queue):
+        while True:
+            message = queue.get()
+
+            if message is None:
+                return
+
+            job_id, size, t = message
+            job = self._jobs.get(job_id)
+
+            if job is not None:
+                loop, progress = job
+                loop.call_soon_threadsafe(progress, size, t)
+
+    async def render(self, description: SceneDescription, *,
+                     progress: typing.Callable[[int, float], typing.Any] = None, size_limit=UPLOAD_LIMIT):
+        """renders a scene description in a worker process and returns (path, animated)
+
+        the output is left in a temporary file which the caller is responsible for removing, unless the call is
+        cancelled, in which case the file is removed once the worker is done with it;
+        progress is called in the event loop with the current output size in bytes and the frame second;
+        RenderTooLarge is raised if the output grows past size_limit;
+        if a worker dies the pool is replaced and BrokenProcessPool is raised for the jobs it took down"""
+        self.start()
+
+        loop = asyncio.get_running_loop()
+        job_id = next(self._job_ids)
+
+        if progress is not None:
+            self._jobs[job_id] = (loop, progress)
+
+        pool = self._pool
+
+        future = loop.run_in_executor(pool, partial(render_job, job_id, description,
+                                                    size_limit, self.progress_interval))
+
+        try:
+            # shielded so a cancelled caller still gets to clean up the file the worker goes on to write
+            return await asyncio.shield(future)
+
+        except asyncio.CancelledError:
+            future.add_done_callback(_discard_output)
+            raise
+
+        except BrokenProcessPool:
+            # every job sharing the dead pool ends up here, only the first one replaces it
+            if self._pool is pool:
+                self.shutdown()
+                self.start()
+            raise
+
+        finally:
+            self._jobs.pop(job_id, None)
+
+
+render_engine = RenderEngine()
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import typing
+from typing import TYPE_CHECKING
+
+from etcetra.scenery import Quality, SceneCost
+
+if TYPE_CHECKING:
+    from etcetra.scenery import SceneDescription
+
+
+DEFAULT_LADDER = (
+    Quality(),
+    Quality(fps=30),
+    Quality(fps=30, colors=64),
+    Quality(fps=20, scale=0.75, colors=64),
+    Quality(fps=15, scale=0.5, colors=32),
+)
+
+
+class QualityLadder:
+    """picks the best quality predicted to fit the upload limit from the statistics of earlier renders"""
+
+    def __init__(self, steps=DEFAULT_LADDER, *, initial_ratio=0.4, smoothing=0.3, margin=0.9):
+        self.steps = steps
+        self.initial_ratio = initial_ratio
+        self.smoothing = smoothing
+        self.margin = margin
+
+        # encoded bytes per cost unit, per kind of scene
+        self.ratios: typing.Dict[str, float] = {}
+
+    @staticmethod
+    def _kind(description: SceneDescription):
+        return type(description).__name__
+
+    def predict(self, description: SceneDescription, cost: SceneCost, quality: Quality) -> float:
+        return cost.units(quality) * self.ratios.get(self._kind(description), self.initial_ratio)
+
+    def plan(self, description: SceneDescription, cost: SceneCost, limit) -> typing.List[Quality]:
+        """the steps worth trying, best first; steps predicted to overflow are skipped"""
+        for idx, quality in enumerate(self.steps):
+            if self.predict(description, cost, quality) <= limit * self.margin:
+                return list(self.steps[idx:])
+
+        # nothing is predicted to fit, the cheapest step is still worth a shot
+        return [self.steps[-1]]
+
+    def record(self, description: SceneDescription, cost: SceneCost, quality: Quality, size):
+        units = cost.units(quality)
+
+        if units <= 0:
+            return
+
+        kind = self._kind(description)
+        ratio = size / units
+
+        if kind in self.ratios:
+            self.ratios[kind] += (ratio - self.ratios[kind]) * self.smoothing
+
+        else:
+            self.ratios[kind] = ratio
+
+    def record_overflow(self, description: SceneDescription, cost: SceneCost, quality: Quality, limit, reached):
+        """the render passed limit bytes at the reached frame second"""
+        if not cost.animated or reached <= 0:
+            return
+
+        partial_cost = cost._replace(seconds=min(reached, cost.seconds))
+        units = partial_cost.units(quality)
+
+        if units <= 0:
+            return
+
+        kind = self._kind(description)
+        # a lower bound; the whole render would have been at least this dense
+        self.ratios[kind] = max(self.ratios.get(kind, self.initial_ratio), limit / units)
+
+
+quality_ladder = QualityLadder()
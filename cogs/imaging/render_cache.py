@@ -0,0 +1,85 @@
+import hashlib
+import os
+import typing
+
+from cogs.imaging.executor import execute
+from etcetra.disk_cache import DiskCache
+from etcetra.sized_lru_cache import SizedLRUCache
+
+MEGABYTE = 1024 * 1024
+
+
+def _entry_size(entry):
+    data, _ = entry
+    return len(data)
+
+
+def _file_name(key, animated):
+    return f"{key}.{'gif' if animated else 'png'}"
+
+
+class RenderCache:
+    """content addressed cache of finished renders
+
+    entries are (data, animated) pairs; the memory tier is always present and the disk tier
+    is only used when a directory is given"""
+
+    def __init__(self, *, memory_budget=64 * MEGABYTE, directory=None, disk_budget=512 * MEGABYTE):
+        self.memory = SizedLRUCache(memory_budget, sizeof=_entry_size)
+        self.disk = None if directory is None else DiskCache(directory, disk_budget)
+
+    @staticmethod
+    def key(name, source: bytes, *flag_urls, **parameters) -> str:
+        digest = hashlib.sha256()
+        digest.update(name.encode())
+        digest.update(hashlib.sha256(source).digest())
+
+        for url in flag_urls:
+            digest.update(b"\0" + url.encode())
+
+        for parameter, value in sorted(parameters.items()):
+            digest.update(f"\0{parameter}={value}".encode())
+
+        return digest.hexdigest()
+
+    async def get(self, key) -> typing.Optional[typing.Tuple[bytes, bool]]:
+        entry = self.memory.get(key)
+
+        if entry is None and self.disk is not None:
+            entry = await execute(self._read_disk, key)
+
+            if entry is not None:
+                self.memory.put(key, entry)
+
+        return entry
+
+    async def put(self, key, data: bytes, animated: bool):
+        self.memory.put(key, (data, animated))
+
+        if self.disk is not None:
+            await execute(self.disk.put, _file_name(key, animated), data)
+
+    async def put_file(self, key, path, animated: bool):
+        """like put, but takes ownership of a finished render on disk; the file is moved or removed"""
+        await execute(self._put_file, key, path, animated)
+
+    def _put_file(self, key, path, animated):
+        if self.disk is not None:
+            # a later hit reads it back into the memory tier, the render isn't loaded just to be cached
+            self.disk.adopt(_file_name(key, animated), path)
+            return
+
+        with open(path, "rb") as fp:
+            data = fp.read()
+
+        os.remove(path)
+        self.memory.put(key, (data, animated))
+
+    def _read_disk(self, key):
+        for animated in True, False:
+            data = self.disk.get(_file_name(key, animated))
+
+            if data is not None:
+                return data, animated
+
+        return None
@@ -1,53 +1,107 @@
+import functools
 import typing
 
 import nextcord
+import numpy as np
 from PIL import Image
-from PIL.ImageDraw import ImageDraw
 from nextcord.ext import commands
 
 
-def center_resize(target: Image.Image, width, height):
+def center_resize(target: Image.Image, width, height, region=None):
+    """target scaled to cover width x height and cropped to it; with a region box only that part of the result is
+    resampled"""
     scale = max(width / target.width, height / target.height)
 
-    new_width = target.width * scale
-    new_height = target.height * scale
+    # rounded like svg flags drawn at a size, and never short of the target by a rounding error
+    new_width = max(round(target.width * scale), width)
+    new_height = max(round(target.height * scale), height)
 
-    x = (new_width - width) / 2
-    y = (new_height - height) / 2
+    x = (new_width - width) // 2
+    y = (new_height - height) // 2
 
-    box = [int(i) for i in (x, y, x + width, y + height)]
+    left, top, right, bottom = region or (0, 0, width, height)
+    box = (x + left, y + top, x + right, y + bottom)
 
-    return target.resize((int(new_width), int(new_height))).crop(box)
+    if (new_width, new_height) == target.size:
+        # already drawn at the right scale, e.g. svg flags opened with a size
+        return target.crop(box)
 
+    # the same sampling as resizing the whole image and cropping, without resampling what gets cropped away
+    x_ratio = target.width / new_width
+    y_ratio = target.height / new_height
 
-def stitch_flags(size, *flags: Image):
-    mask = Image.new("L", size, 0)
-    ret = Image.new("RGB", size, (0, 0, 0))
+    return target.resize((right - left, bottom - top),
+                         box=(box[0] * x_ratio, box[1] * y_ratio,
+                              min(box[2] * x_ratio, target.width), min(box[3] * y_ratio, target.height)))
+
+
+def _band_labels(size, count) -> np.ndarray:
+    """index of the flag shown at each pixel, for count diagonal bands over an image of size"""
+    width, height = size
+    spacing = width / (count - 1)
+
+    # band idx is the triangle through (idx - 1, idx, idx + 1) * spacing, apexes alternating bottom and top;
+    # inside segment k the diagonal between apexes k and k + 1 separates band k from band k + 1
+    x = (np.arange(width) + 0.5) / spacing
+    y = np.arange(height)[:, None] + 0.5
+
+    segment = np.clip(np.floor(x), 0, count - 2).astype(np.intp)
+    progress = x - segment
+    falling = segment % 2 == 0
+
+    diagonal = np.where(falling, height * (1 - progress), height * progress)
+    in_segment_band = np.where(falling, y < diagonal, y > diagonal)
 
-    mask_drawer = ImageDraw(mask)
+    return segment + np.logical_not(in_segment_band)
 
-    spacing = 1 / (len(flags) - 1) * size[0]
 
-    def generate_point_for_idx(index):
-        return index * spacing, size[1] if index % 2 == 0 else 0
+@functools.lru_cache(maxsize=32)
+def band_masks(size, count, strips=4) -> typing.List[typing.List[typing.Tuple[tuple, Image.Image]]]:
+    """(box, mask) pieces of each of count diagonal bands over an image of size
 
-    for idx, flag in enumerate(flags):
-        points = [*generate_point_for_idx(idx - 1), *generate_point_for_idx(idx), *generate_point_for_idx(idx + 1)]
+    every band is split into column strips and each piece is bounded to the rows the band reaches in it, so
+    roughly only the band's own triangle gets resampled; the L mask of a piece covers its box"""
+    labels = _band_labels(size, count)
+    bands = []
 
-        mask_drawer.polygon(points, 255)
+    for idx in range(count):
+        band = labels == idx
+        columns = np.flatnonzero(band.any(axis=0))
+        pieces = []
 
-        flag = center_resize(flag, *size)
+        if len(columns) > 0:
+            edges = np.linspace(columns[0], columns[-1] + 1, strips + 1).astype(int)
 
-        ret.paste(flag, mask=mask)
+            for left, right in zip(edges, edges[1:]):
+                rows = np.flatnonzero(band[:, left:right].any(axis=1))
+
+                if right > left and len(rows) > 0:
+                    box = (int(left), int(rows[0]), int(right), int(rows[-1]) + 1)
+                    mask = band[box[1]:box[3], box[0]:box[2]].astype(np.uint8) * 255
+                    pieces.append((box, Image.fromarray(mask, "L")))
+
+        bands.append(pieces)
+
+    return bands
+
+
+def stitch_flags(size, *flags: Image):
+    size = tuple(size)
+    ret = Image.new("RGB", size, (0, 0, 0))
 
-        mask_drawer.rectangle((0, 0) + mask.size, 0)  # clear
+    for idx, (flag, pieces) in enumerate(zip(flags, band_masks(size, len(flags)))):
+        for box, mask in pieces:
+            # each flag is only resampled where its band is; the first needs no mask as the bands after it cover
+            # whatever it draws outside its own
+            ret.paste(center_resize(flag, *size, region=box), box[:2], None if idx == 0 else mask)
 
     return ret
 
 
-async def try_get_image(ctx: commands.Context, user: typing.Optional[nextcord.Member]):
+async def find_image_source(ctx: commands.Context, user: typing.Optional[nextcord.Member]):
+    """the avatar or attachment a command should work on, to be read through the avatar cache"""
     if user is not None:
-        return await user.avatar.read()
+        return user.display_avatar
 
     if ctx.message.reference is None:
         target = ctx.message
@@ -57,7 +111,7 @@ async def try_get_image(ctx: commands.Context, user: typing.Optional[nextcord.Me
     target: nextcord.Message
 
     if target.attachments:
-        return await target.attachments[0].read()
+        return target.attachments[0]
 
     else:
-        return await target.author.avatar.read()
+        return target.author.display_avatar
@@ -0,0 +1,186 @@
+import asyncio
+import contextlib
+import typing
+from collections import OrderedDict, deque
+
+
+class QueueFull(Exception):
+    pass
+
+
+class _Ticket:
+    __slots__ = ("guild_id", "user_id", "cost", "future", "on_position", "position")
+
+    def __init__(self, guild_id, user_id, cost, future, on_position):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.cost = cost
+        self.future: asyncio.Future = future
+        self.on_position: typing.Optional[typing.Callable[[int, float], typing.Awaitable]] = on_position
+        self.position = None
+
+
+class RenderScheduler:
+    """hands out render slots round robin between guilds, and between users inside a guild
+
+    jobs are refused once the queue holds too many jobs or too much estimated cost"""
+
+    def __init__(self, slots, *, max_queued=16, max_queued_cost=None, max_per_user=2):
+        self.slots = slots
+        self.max_queued = max_queued
+        self.max_queued_cost = max_queued_cost
+        self.max_per_user = max_per_user
+
+        self.running = 0
+        self.running_cost = 0
+        self.queued = 0
+        self.queued_cost = 0
+
+        # guild -> user -> tickets; both levels rotate as jobs are handed out
+        self._queues: typing.OrderedDict[int, typing.OrderedDict[int, typing.Deque[_Ticket]]] = OrderedDict()
+        self._per_user: typing.Dict[int, int] = {}
+
+    @property
+    def busy(self):
+        return self.running >= self.slots
+
+    @contextlib.asynccontextmanager
+    async def slot(self, guild_id, user_id, cost, *,
+                   on_position: typing.Callable[[int, float], typing.Awaitable] = None):
+        """waits for a render slot; on_position is called with the 1-based queue position and the cost ahead
+
+        raises QueueFull if the job is shed"""
+        ticket = self._enqueue(guild_id, user_id, cost, on_position)
+
+        try:
+            await ticket.future
+
+        except asyncio.CancelledError:
+            if ticket.future.done() and not ticket.future.cancelled():
+                # the slot was granted just as the waiter went away
+                self._release(ticket)
+            else:
+                self._remove(ticket)
+            raise
+
+        try:
+            yield
+
+        finally:
+            self._release(ticket)
+
+    def _enqueue(self, guild_id, user_id, cost, on_position):
+        if self.queued >= self.max_queued or \
+                (self.max_queued_cost is not None and self.queued > 0 and
+                 self.queued_cost + cost > self.max_queued_cost):
+            raise QueueFull("the render queue is full")
+
+        if self._per_user.get(user_id, 0) >= self.max_per_user:
+            raise QueueFull("too many renders requested at once")
+
+        ticket = _Ticket(guild_id, user_id, cost, asyncio.get_running_loop().create_future(), on_position)
+
+        self._queues.setdefault(guild_id, OrderedDict()).setdefault(user_id, deque()).append(ticket)
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+        self.queued += 1
+        self.queued_cost += cost
+
+        self._dispatch()
+        return ticket
+
+    def _remove(self, ticket: _Ticket):
+        users = self._queues.get(ticket.guild_id, None)
+
+        if users is None or ticket not in users.get(ticket.user_id, ()):
+            return
+
+        tickets = users[ticket.user_id]
+        tickets.remove(ticket)
+
+        if not tickets:
+            del users[ticket.user_id]
+
+        if not users:
+            del self._queues[ticket.guild_id]
+
+        self.queued -= 1
+        self.queued_cost -= ticket.cost
+        self._forget_user(ticket)
+        self._notify_positions()
+
+    def _release(self, ticket: _Ticket):
+        self.running -= 1
+        self.running_cost -= ticket.cost
+        self._forget_user(ticket)
+        self._dispatch()
+
+    def _forget_user(self, ticket: _Ticket):
+        self._per_user[ticket.user_id] -= 1
+
+        if self._per_user[ticket.user_id] == 0:
+            del self._per_user[ticket.user_id]
+
+    def _pop_next(self) -> _Ticket:
+        guild_id, users = self._queues.popitem(last=False)
+        user_id, tickets = users.popitem(last=False)
+
+        ticket = tickets.popleft()
+
+        if tickets:
+            users[user_id] = tickets
+
+        if users:
+            self._queues[guild_id] = users
+
+        return ticket
+
+    def _dispatch(self):
+        while self.running < self.slots and self._queues:
+            ticket = self._pop_next()
+
+            self.queued -= 1
+            self.queued_cost -= ticket.cost
+
+            if ticket.future.done():
+                # the waiter was cancelled but hasn't run its cleanup yet
+                self._forget_user(ticket)
+                continue
+
+            self.running += 1
+            self.running_cost += ticket.cost
+
+            ticket.future.set_result(None)
+
+        self._notify_positions()
+
+    def order(self) -> typing.List[_Ticket]:
+        """the order in which the queued tickets will be handed out"""
+        # rotations only ever look at the heads, so simulating on shallow copies is enough
+        queues = OrderedDict((guild_id, OrderedDict((user_id, deque(tickets)) for user_id, tickets in users.items()))
+                             for guild_id, users in self._queues.items())
+        ret = []
+
+        while queues:
+            guild_id, users = queues.popitem(last=False)
+            user_id, tickets = users.popitem(last=False)
+
+            ret.append(tickets.popleft())
+
+            if tickets:
+                users[user_id] = tickets
+
+            if users:
+                queues[guild_id] = users
+
+        return ret
+
+    def _notify_positions(self):
+        loop = asyncio.get_running_loop()
+        ahead = self.running_cost
+
+        for position, ticket in enumerate(self.order(), start=1):
+            if ticket.position != position and ticket.on_position is not None:
+                loop.create_task(ticket.on_position(position, ahead))
+
+            ticket.position = position
+            ahead += ticket.cost
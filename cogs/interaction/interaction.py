@@ -1,9 +1,9 @@
 import operator
 
-import aiohttp.client
 from nextcord.ext import commands
 from phrase_reference_builder.types import MaybeReflexive, was
 
+from etcetra.http_client import client
 from etcetra.pronouns import convert_string_to_pronoun
 from .command import interaction_command_factory
 from .fragments import author, valid, rejected
@@ -13,10 +13,7 @@ NEKO_BOT_BASE = "https://nekos.life/api/v2/"
 
 def neko_bot_get_random(path):
     async def func():
-        async with aiohttp.client.ClientSession() as session:
-            async with session.get(f"{NEKO_BOT_BASE}/{path}") as response:
-                url = (await response.json())["url"]
-                return url
+        return (await client.json(f"{NEKO_BOT_BASE}/{path}"))["url"]
 
     return func
 
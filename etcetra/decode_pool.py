@@ -0,0 +1,58 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from etcetra.instrumentation import track_executor
+
+
+class DecodeRejected(Exception):
+    pass
+
+
+class DecodeTimeout(Exception):
+    pass
+
+
+class DecodePool:
+    """small thread pool for parsing and decoding untrusted images away from the event loop
+
+    jobs past max_pending are refused rather than queued; a job that times out keeps its slot
+    until its thread is actually done, so a flood of slow inputs can't grow the backlog"""
+
+    def __init__(self, workers=None, *, max_pending=32, timeout=10):
+        self.workers = workers or int(os.getenv("decode_workers", 2))
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self.pending = 0
+
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="decode")
+        self.stats = track_executor("decode")
+
+    def _finished(self, future: asyncio.Future):
+        self.pending -= 1
+
+        if not future.cancelled():
+            # retrieved here so abandoned jobs don't warn about unretrieved exceptions
+            future.exception()
+
+    async def run(self, func, *args, timeout=None, **kwargs):
+        if self.pending >= self.max_pending:
+            raise DecodeRejected("too many images are being decoded")
+
+        loop = asyncio.get_running_loop()
+        future = self.stats.run_in_executor(loop, self._executor, partial(func, *args, **kwargs),
+                                            getattr(func, "__qualname__", None))
+
+        self.pending += 1
+        future.add_done_callback(self._finished)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout if timeout is None else timeout)
+
+        except asyncio.TimeoutError:
+            raise DecodeTimeout("the image took too long to decode") from None
+
+
+decode_pool = DecodePool()
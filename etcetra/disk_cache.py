@@ -0,0 +1,109 @@
+import os
+import shutil
+import threading
+import typing
+from collections import OrderedDict
+
+
+class DiskCache:
+    """directory of files bounded by their summed size, least recently used files are removed first
+
+    recency survives restarts through the file mtimes; it's blocking, so call it from executor threads"""
+
+    def __init__(self, directory, budget):
+        self.directory = directory
+        self.budget = budget
+        self.size = 0
+
+        # file name -> size, oldest first
+        self._entries: typing.OrderedDict[str, int] = OrderedDict()
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def _load_index(self):
+        entries = []
+
+        for file in os.listdir(self.directory):
+            if file.endswith(".tmp"):
+                # left behind by an interrupted write
+                os.remove(os.path.join(self.directory, file))
+                continue
+
+            stat = os.stat(os.path.join(self.directory, file))
+            entries.append((stat.st_mtime, file, stat.st_size))
+
+        for _, file, size in sorted(entries):
+            self._entries[file] = size
+            self.size += size
+
+        self._evict()
+
+    def get(self, name) -> typing.Optional[bytes]:
+        with self._lock:
+            if name not in self._entries:
+                return None
+
+            path = os.path.join(self.directory, name)
+
+            try:
+                with open(path, "rb") as fp:
+                    data = fp.read()
+
+            except FileNotFoundError:
+                self.size -= self._entries.pop(name)
+                return None
+
+            # mtime is the recency used when the index is rebuilt
+            os.utime(path)
+            self._entries.move_to_end(name)
+
+            return data
+
+    def put(self, name, data: bytes):
+        if len(data) > self.budget:
+            return
+
+        with self._lock:
+            path = os.path.join(self.directory, name)
+
+            with open(path + ".tmp", "wb") as fp:
+                fp.write(data)
+
+            os.replace(path + ".tmp", path)
+            self._track(name, len(data))
+
+    def adopt(self, name, path):
+        """moves an existing file into the cache, or removes it if it doesn't fit"""
+        size = os.path.getsize(path)
+
+        if size > self.budget:
+            os.remove(path)
+            return
+
+        with self._lock:
+            # the file may be on another filesystem, such as the system temporary directory
+            shutil.move(path, os.path.join(self.directory, name))
+            self._track(name, size)
+
+    def _track(self, name, size):
+        self.size -= self._entries.pop(name, 0)
+        self._entries[name] = size
+        self.size += size
+
+        self._evict()
+
+    def _evict(self):
+        while self.size > self.budget and self._entries:
+            file, size = self._entries.popitem(last=False)
+            self.size -= size
+
+            try:
+                os.remove(os.path.join(self.directory, file))
+
+            except FileNotFoundError:
+                pass
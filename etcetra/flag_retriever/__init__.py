@@ -1,8 +1,17 @@
+import asyncio
 import functools
 import typing
 
 from .abc import FlagRetriever
-from .flag import Flag
+from .exceptions import FlagOpenError
+from .flag import Flag, Size
+from .search_index import FlagSearchIndex
+
+if typing.TYPE_CHECKING:
+    from PIL import Image
+
+search_index = FlagSearchIndex()
+_indexed_names: typing.Dict[str, typing.Set[str]] = {}
 
 
 @functools.lru_cache()
@@ -23,13 +32,31 @@ async def get_flag(name, schema=None) -> typing.Optional[Flag]:
                 return ret
 
 
-async def search(name, schema=None) -> typing.Set[str]:
-    ret = set()
+async def open_flags(flags: typing.Iterable[Flag], *, size: typing.Union[Size, typing.Awaitable[Size]] = None,
+                     concurrency=4) -> typing.List[typing.Union["Image.Image", FlagOpenError]]:
+    """opens flags concurrently, drawing svgs to cover size if given, which may be a future so the flags download
+    while it's being worked out; results keep the order of the input and failures are returned in place"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def open_flag(flag):
+        async with semaphore:
+            try:
+                return await flag.open(size)
+
+            except FlagOpenError as e:
+                return e
 
+    return list(await asyncio.gather(*(open_flag(flag) for flag in flags)))
+
+
+async def refresh_retrievers():
     for retriever in get_retrievers():
-        if schema is None or retriever.schema == schema:
-            this_ret = await retriever.search(name)
+        try:
+            await retriever.refresh()
+            _indexed_names[retriever.schema] = await retriever.names()
 
-            ret |= this_ret
+        except Exception as e:
+            # keep what was indexed last time for this retriever
+            print(f"could not refresh flags of {retriever}: {e}")
 
-    return ret
+    search_index.rebuild((schema, name) for schema, names in _indexed_names.items() for name in names)
@@ -18,5 +18,10 @@ class FlagRetriever(abc.ABC):
     async def get_flag(self, name) -> typing.Optional[Flag]:
         pass
 
-    async def search(self, name) -> typing.Set[str]:
+    async def refresh(self):
+        """called periodically in the background to update any local copy of the remote data"""
+        pass
+
+    async def names(self) -> typing.Set[str]:
+        """every name this retriever can currently resolve, used to build the search index"""
         return set()
@@ -1,10 +1,24 @@
 import difflib
+import json
+import os
+import time
 import typing
+import unicodedata
 
-import aiohttp
-
+from etcetra.http_client import client
 from . import Flag
 from .abc import FlagRetriever
+from .search_index import FlagSearchIndex
+
+CODES_URL = "https://flagcdn.com/en/codes.json"
+BUNDLED_SNAPSHOT = os.path.join(os.path.dirname(__file__), "data", "flagcdn_codes.json")
+
+REFRESH_INTERVAL = 24 * 60 * 60
+
+
+def normalize(name: str):
+    decomposed = unicodedata.normalize("NFKD", name.casefold())
+    return "".join(letter for letter in decomposed if letter.isalnum())
 
 
 class CountryFlagRetriever(FlagRetriever):
@@ -13,41 +27,88 @@ class CountryFlagRetriever(FlagRetriever):
         return "country"
 
     def __init__(self):
-        self._codes: typing.Optional[dict] = None
-        self._codes_inverted: typing.Optional[dict] = None
+        self.snapshot_path = os.getenv("flag_codes_snapshot", "flagcdn_codes.json")
 
-    async def get_codes(self) -> dict:
-        if self._codes is None:
-            async with aiohttp.request("GET", f"https://flagcdn.com/en/codes.json") as code_response:
-                self._codes = await code_response.json()
-                self._codes = {k.lower(): v for k, v in self._codes.items()}
+        self._codes: typing.Dict[str, str] = {}
+        self._codes_inverted: typing.Dict[str, str] = {}
+        self._normalized: typing.Dict[str, str] = {}
+        self._index = FlagSearchIndex()
+        self._fetched_at = 0
+
+        if os.path.exists(self.snapshot_path):
+            path = self.snapshot_path
+            self._fetched_at = os.path.getmtime(path)
+
+        else:
+            path = BUNDLED_SNAPSHOT
+
+        with open(path, encoding="utf-8") as fp:
+            self._swap(json.load(fp))
+
+    def _swap(self, codes: dict):
+        codes = {k.lower(): v for k, v in codes.items()}
+        inverted = {v: k for k, v in codes.items()}
+        normalized = {normalize(v): v for v in codes.values()}
+
+        index = FlagSearchIndex()
+        index.rebuild((self.schema, name) for name in normalized)
 
+        # no awaits in between, so readers never see a half updated set
+        self._codes, self._codes_inverted, self._normalized, self._index = codes, inverted, normalized, index
+
+    async def refresh(self):
+        if time.time() - self._fetched_at < REFRESH_INTERVAL:
+            return
+
+        codes = await client.json(CODES_URL)
+        self._swap(codes)
+        self._fetched_at = time.time()
+
+        with open(self.snapshot_path + ".tmp", "w", encoding="utf-8") as fp:
+            json.dump(codes, fp, ensure_ascii=False)
+
+        os.replace(self.snapshot_path + ".tmp", self.snapshot_path)
+
+    async def get_codes(self) -> dict:
         return self._codes
 
     async def get_inverted_codes(self) -> dict:
-        if self._codes_inverted is None:
-            codes = await self.get_codes()
-            self._codes_inverted = {v: k for k, v in codes.items()}
-
         return self._codes_inverted
 
     async def code_from_name(self, name) -> typing.Optional[str]:
-        return (await self.get_inverted_codes()).get(name, None)
+        return self._codes_inverted.get(name, None)
+
+    def match_name(self, name) -> typing.Optional[str]:
+        normalized = normalize(name)
+
+        if normalized in self._normalized:
+            return self._normalized[normalized]
+
+        # the n-gram index narrows the candidates, the ratio keeps the old matching strictness
+        candidates = self._index.fuzzy(normalized, limit=10)
+        scored = [(difflib.SequenceMatcher(None, normalized, candidate).ratio(), candidate)
+                  for candidate in candidates]
+        scored = [(ratio, candidate) for ratio, candidate in scored if ratio >= 0.8]
+
+        if scored:
+            return self._normalized[max(scored)[1]]
+
+        return None
 
     # noinspection PyTypeChecker
     async def get_flag(self, name) -> typing.Optional[Flag]:
         name = name.lower()
-        codes = await self.get_codes()
+        codes = self._codes
         if name in codes:
             return Flag(f"https://flagcdn.com/w320/{name}.png", codes[name], str(self), is_remote=True)
         else:
-            match = difflib.get_close_matches(name, codes.values(), 1, 0.8)
+            match = self.match_name(name)
             if match:
-                code = await self.code_from_name(match[0])
-                return Flag(f"https://flagcdn.com/w320/{code}.png", match[0], str(self), is_remote=True)
+                code = self._codes_inverted[match]
+                return Flag(f"https://flagcdn.com/w320/{code}.png", match, str(self), is_remote=True)
 
-    async def search(self, name) -> typing.Set[str]:
-        return set(n for n in (await self.get_inverted_codes()).keys() if n.startswith(name))
+    async def names(self) -> typing.Set[str]:
+        return set(self._codes_inverted.keys())
 
     def __str__(self):
         return "flagcdn"
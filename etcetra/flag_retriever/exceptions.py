@@ -1,3 +1,3 @@
 class FlagOpenError(Exception):
-    def __init__(self):
-        super(FlagOpenError, self).__init__("File format of flag is not supported")
+    def __init__(self, message="File format of flag is not supported"):
+        super(FlagOpenError, self).__init__(message)
@@ -1,21 +1,119 @@
 from __future__ import annotations
 
 import asyncio
+import inspect
+import os
 import typing
-from functools import partial
 from io import BytesIO, StringIO
+from urllib.parse import urlsplit
 
 import aiofiles
-import aiohttp
 from PIL import Image
 from nextcord.ext import commands
 
 from reportlab.graphics import renderPM
+from reportlab.graphics.shapes import Drawing, Group
 from svglib.svglib import svg2rlg
 
+from etcetra.decode_pool import decode_pool, DecodeRejected, DecodeTimeout
+from etcetra.http_client import client
+from etcetra.sized_lru_cache import SizedLRUCache
 from .exceptions import FlagOpenError
 
 
+def image_size(image: Image.Image):
+    return image.width * image.height * len(image.getbands())
+
+
+Size = typing.Optional[typing.Tuple[int, int]]
+
+# rasterized flags shared by every command, keyed by (url, size); raster flags are only stored with size None,
+# svgs with the size they were drawn to cover
+decoded_flags: SizedLRUCache[typing.Tuple[str, Size], Image.Image] = \
+    SizedLRUCache(64 * 1024 * 1024, sizeof=image_size, ttl=60 * 60)
+# parsed svgs, so another size is only a rasterization away
+drawings: SizedLRUCache[str, Drawing] = SizedLRUCache(32, sizeof=lambda _: 1, ttl=60 * 60)
+_decoding: typing.Dict[typing.Tuple[str, Size], asyncio.Task] = {}
+_vector_urls: typing.Set[str] = set()
+_raster_urls: typing.Set[str] = set()
+
+RASTER_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp"}
+
+MAX_FLAG_BYTES = 8 * 1024 * 1024
+MAX_FLAG_PIXELS = 4096 * 4096
+
+
+def _check_pixels(width, height):
+    if width * height > MAX_FLAG_PIXELS:
+        raise FlagOpenError(f"the flag is too large to draw ({int(width)}x{int(height)})")
+
+
+def _decode_raster(io):
+    image = Image.open(io)
+    # only the header has been read at this point
+    _check_pixels(*image.size)
+    image.load()
+    return image
+
+
+def _rasterize(drawing: Drawing, size: Size) -> Image.Image:
+    """draws the svg at the smallest size covering size, so center_resize only has to crop"""
+    if size is None or drawing.width <= 0 or drawing.height <= 0:
+        scale = 1
+        width, height = drawing.width, drawing.height
+
+    else:
+        scale = max(size[0] / drawing.width, size[1] / drawing.height)
+        width = max(round(drawing.width * scale), size[0])
+        height = max(round(drawing.height * scale), size[1])
+
+    _check_pixels(width, height)
+
+    # the cached drawing is shared, so it's wrapped instead of scaled in place
+    target = Drawing(width, height)
+    target.add(Group(*drawing.contents, transform=(scale, 0, 0, scale, 0, 0)))
+
+    return renderPM.drawToPIL(target)
+
+
+def _decode_flag(data: typing.Optional[bytes], drawing: typing.Optional[Drawing],
+                 size: Size) -> typing.Tuple[typing.Optional[Drawing], Image.Image]:
+    """the whole decode of a flag, meant for the decode pool; data is only needed without a parsed drawing"""
+    if drawing is None and b"<svg" in data:
+        # maybe svg
+        drawing = svg2rlg(BytesIO(data))
+
+        if drawing is None:
+            raise FlagOpenError("the svg could not be parsed")
+
+    if drawing is None:
+        # maybe raster image
+        return None, _decode_raster(BytesIO(data))
+
+    return drawing, _rasterize(drawing, size)
+
+
+def _discard(task: asyncio.Future):
+    if task.done():
+        if not task.cancelled():
+            task.exception()
+
+    else:
+        task.cancel()
+
+
+def may_be_vector(url) -> bool:
+    """false only for urls known to hold raster images, from an earlier decode or their extension"""
+    if url in _vector_urls:
+        return True
+
+    if url in _raster_urls:
+        return False
+
+    _, extension = os.path.splitext(urlsplit(url).path)
+    return extension.lower() not in RASTER_EXTENSIONS
+
+
 class Flag:
     def __init__(self, url, name, provider, *, is_remote=False):
         self.is_remote = is_remote
@@ -25,38 +123,98 @@ class Flag:
 
     async def read(self) -> typing.Optional[bytes]:
         if self.is_remote:
-            obj = aiohttp.request("GET", self.url)
-        else:
-            obj = aiofiles.open(self.url, "rb")
+            return await client.read(self.url)
 
-        async with obj as reader:
+        async with aiofiles.open(self.url, "rb") as reader:
             return await reader.read()
 
-    async def open(self) -> typing.Optional[Image.Image]:
+    async def _fetch(self) -> bytes:
         data = await self.read()
 
-        if b"<svg" in data:
-            # maybe svg
-            try:
-                drawing = svg2rlg(data)
-                io = BytesIO()
-                renderPM.drawToFile(drawing, io, fmt="PNG")
+        if len(data) > MAX_FLAG_BYTES:
+            raise FlagOpenError("the flag file is too large")
 
-            except Exception as e:
-                print(e)
-                raise FlagOpenError from e
-        else:
-            # maybe raster image
-            io = BytesIO(data)
+        return data
+
+    def _needs_fetch(self) -> bool:
+        if self.url in _raster_urls:
+            return (self.url, None) not in decoded_flags
+
+        return self.url not in drawings
+
+    async def open(self, size: typing.Union[Size, typing.Awaitable[Size]] = None) -> typing.Optional[Image.Image]:
+        """returns the decoded flag; the image is shared between callers and should not be modified in place
+
+        svg flags are drawn to cover size, raster flags are returned at their own size; size may also be a
+        future shared between flags, the file is then downloaded while it's being worked out"""
+        fetching = None
+
+        try:
+            if inspect.isawaitable(size):
+                if self._needs_fetch():
+                    fetching = asyncio.get_running_loop().create_task(self._fetch())
+
+                size = await asyncio.shield(size)
+
+            # anything that may turn out to be an svg is keyed by size before its first decode tells
+            key = (self.url, tuple(size) if size is not None and may_be_vector(self.url) else None)
+            image = decoded_flags.get(key)
+
+            if image is not None:
+                return image
 
-        loop = asyncio.get_running_loop()
+            task = _decoding.get(key)
+
+            if task is None:
+                task = asyncio.get_running_loop().create_task(self._decode(key[1], fetching))
+                fetching = None  # the decode owns it now
+
+                _decoding[key] = task
+                task.add_done_callback(lambda _: _decoding.pop(key, None))
+
+            # other commands may be waiting on the same decode
+            return await asyncio.shield(task)
+
+        finally:
+            if fetching is not None:
+                _discard(fetching)
+
+    async def _decode(self, size: Size, fetching: typing.Optional[asyncio.Task] = None) -> Image.Image:
+        data = None
+        drawing = drawings.get(self.url)
+
+        if drawing is None:
+            data = await (self._fetch() if fetching is None else fetching)
+
+        elif fetching is not None:
+            _discard(fetching)
 
         try:
-            return await loop.run_in_executor(None, partial(Image.open, io))
+            # rasterizing stays next to parsing in the bounded decode pool; the render processes are
+            # admitted by the render scheduler and would need the drawing pickled across
+            drawing, image = await decode_pool.run(_decode_flag, data, drawing, size)
+
+        except FlagOpenError:
+            raise
+
+        except (DecodeRejected, DecodeTimeout) as e:
+            raise FlagOpenError(str(e)) from e
 
         except Exception as e:
+            print(e)
             raise FlagOpenError from e
 
+        if drawing is None:
+            _raster_urls.add(self.url)
+            size = None
+
+        else:
+            drawings.put(self.url, drawing)
+            _vector_urls.add(self.url)
+
+        decoded_flags.put((self.url, None if size is None else tuple(size)), image)
+        return image
+
     @classmethod
     async def convert(cls, _, argument) -> Flag:
         from etcetra.flag_retriever import get_flag
@@ -1,81 +1,91 @@
+import os
 import typing
 import urllib.parse
 
-import aiohttp
-
+from etcetra.http_client import client
 from . import Flag
 from .abc import FlagRetriever
+from .lookup_cache import LookupCache, MISSING
+
+API_BASE = "https://lgbta.wikia.org/api.php"
 
 
 class LGBTFlagRetriever(FlagRetriever):
+    def __init__(self):
+        self.cache = LookupCache(os.getenv("flag_lookup_cache", "flag_lookup_cache.sqlite3"))
+
+        # the wiki can't be listed cheaply, so titles are learned from lookups
+        self.known_titles: typing.Set[str] = set()
+        self._loaded_titles = False
+
     @property
     def schema(self):
         return "lgbt"
 
     async def get_flag(self, name) -> typing.Optional[Flag]:
-        async with aiohttp.ClientSession() as session:
-
-            async with session.get(f"https://lgbta.wikia.org/api.php?action=query&"
-                                   f"list=search&srsearch={urllib.parse.quote(name)}"
-                                   f"&format=json") as search_response:
-                json_content = await search_response.json()
-                pages = json_content["query"]["search"]
-
-                if pages:
-                    # there's results; get article image
-                    first_page_id = pages[0]["pageid"]
-                    first_page_title = pages[0]["title"]
-
-                    async with session.get(f"https://lgbta.wikia.org/api.php?action=imageserving&"
-                                           f"wisId={first_page_id}&format=json") as image_response:
-                        json_content = await image_response.json()
-
-                        if "error" not in json_content and "image" in json_content:
-                            return Flag(json_content["image"]["imageserving"], first_page_title, str(self),
-                                        is_remote=True)
-
-                        else:
-                            # article has no thumbnail for some reason
-                            async with session.get(f"https://lgbta.wikia.org/api.php?action=query&prop=images&titles="
-                                                   f"{urllib.parse.quote(first_page_title)}&format=json") as content_response:
-
-                                json_content = await content_response.json()
-
-                                if "error" not in json_content and\
-                                        "images" in json_content["query"]["pages"][str(first_page_id)]:
-                                    images = json_content["query"]["pages"][str(first_page_id)]["images"]
-
-                                    if images:
-                                        image_title = images[0]["title"]
-                                        async with session.get(f"https://lgbta.wikia.org/api.php?action=query&titles="
-                                                               f"{urllib.parse.quote(image_title)}&prop=imageinfo"
-                                                               f"&iiprop=url&format=json") as alternative_image_response:
-                                            json_content = await alternative_image_response.json()
-                                            print(json_content)
-                                            pages = json_content["query"]["pages"]
-                                            page = pages[list(pages)[0]]
-                                            return Flag(page["imageinfo"][0]["url"], first_page_title,
-                                                        str(self), is_remote=True)
+        cached = await self.cache.get_flag(name)
 
-        return None
+        if cached is MISSING:
+            flag = await self._resolve_flag(name)
+            await self.cache.put_flag(name, None if flag is None else (flag.url, flag.name))
+            return flag
+
+        if cached is not None:
+            url, title = cached
+            return Flag(url, title, str(self), is_remote=True)
 
-    async def search(self, name) -> typing.Set[str]:
-        if len(name) == 0:
-            return set()
+        return None
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"https://lgbta.wikia.org/api.php?action=query&"
-                                   f"list=search&srsearch={urllib.parse.quote(name)}"
-                                   f"&format=json") as search_response:
-                json_content = await search_response.json()
-                pages = json_content["query"]["search"]
+    async def _resolve_flag(self, name) -> typing.Optional[Flag]:
+        json_content = await client.json(f"{API_BASE}?action=query&"
+                                         f"list=search&srsearch={urllib.parse.quote(name)}"
+                                         f"&format=json")
+        pages = json_content["query"]["search"]
+
+        if pages:
+            # there's results; get article image
+            first_page_id = pages[0]["pageid"]
+            first_page_title = pages[0]["title"]
+
+            json_content = await client.json(f"{API_BASE}?action=imageserving&"
+                                             f"wisId={first_page_id}&format=json")
+
+            self.known_titles.add(first_page_title)
+
+            if "error" not in json_content and "image" in json_content:
+                return Flag(json_content["image"]["imageserving"], first_page_title, str(self),
+                            is_remote=True)
+
+            else:
+                # article has no thumbnail for some reason
+                json_content = await client.json(f"{API_BASE}?action=query&prop=images&titles="
+                                                 f"{urllib.parse.quote(first_page_title)}&format=json")
+
+                if "error" not in json_content and \
+                        "images" in json_content["query"]["pages"][str(first_page_id)]:
+                    images = json_content["query"]["pages"][str(first_page_id)]["images"]
+
+                    if images:
+                        image_title = images[0]["title"]
+                        json_content = await client.json(f"{API_BASE}?action=query&titles="
+                                                         f"{urllib.parse.quote(image_title)}&prop=imageinfo"
+                                                         f"&iiprop=url&format=json")
+                        print(json_content)
+                        pages = json_content["query"]["pages"]
+                        page = pages[list(pages)[0]]
+                        return Flag(page["imageinfo"][0]["url"], first_page_title,
+                                    str(self), is_remote=True)
 
-                if pages:
-                    # there's results
+        return None
 
-                    return set(page["title"] for page in pages[:5])
+    async def refresh(self):
+        if not self._loaded_titles:
+            # titles looked up before a restart
+            self.known_titles |= await self.cache.titles()
+            self._loaded_titles = True
 
-        return set()
+    async def names(self) -> typing.Set[str]:
+        return set(self.known_titles)
 
     def __str__(self):
         return "lgbt wiki"
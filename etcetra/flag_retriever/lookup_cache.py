@@ -0,0 +1,96 @@
+import asyncio
+import sqlite3
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from etcetra.instrumentation import track_executor
+
+MISSING = object()
+
+DAY = 24 * 60 * 60
+
+
+class LookupCache:
+    """persistent memo of remote flag lookups
+
+    a flag lookup maps a name to (url, title) or None when nothing was found; negative results expire sooner
+    so new wiki pages are picked up; sqlite blocks, so every query runs on the cache's own thread"""
+
+    def __init__(self, path, *, ttl=7 * DAY, negative_ttl=DAY):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._connection: typing.Optional[sqlite3.Connection] = None
+
+        # a single thread, as a sqlite connection belongs to the thread that opened it
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="lookup-cache")
+        self.stats = track_executor("lookup cache")
+
+    def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return self.stats.run_in_executor(loop, self._executor, partial(func, *args), func.__qualname__)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path)
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS flags (name TEXT PRIMARY KEY, url TEXT, title TEXT, expires REAL NOT NULL);
+                DROP TABLE IF EXISTS searches;
+            """)
+            self._purge()
+
+        return self._connection
+
+    @staticmethod
+    def _normalize(key):
+        return key.strip().lower()
+
+    def _expiry(self, positive):
+        return time.time() + (self.ttl if positive else self.negative_ttl)
+
+    async def get_flag(self, name) -> typing.Union[None, typing.Tuple[str, str], object]:
+        """returns MISSING if there's no valid entry"""
+        return await self._run(self._get_flag, name)
+
+    def _get_flag(self, name):
+        row = self._connect().execute("SELECT url, title FROM flags WHERE name = ? AND expires > ?",
+                                      (self._normalize(name), time.time())).fetchone()
+
+        if row is None:
+            return MISSING
+
+        url, title = row
+        return None if url is None else (url, title)
+
+    async def put_flag(self, name, result: typing.Optional[typing.Tuple[str, str]]):
+        await self._run(self._put_flag, name, result)
+
+    def _put_flag(self, name, result):
+        url, title = (None, None) if result is None else result
+        connection = self._connect()
+
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO flags VALUES (?, ?, ?, ?)",
+                               (self._normalize(name), url, title, self._expiry(result is not None)))
+
+    async def titles(self) -> typing.Set[str]:
+        return await self._run(self._titles)
+
+    def _titles(self):
+        return set(title for title, in self._connect().execute("SELECT title FROM flags WHERE title IS NOT NULL"))
+
+    def _purge(self):
+        with self._connection:
+            self._connection.execute("DELETE FROM flags WHERE expires <= ?", (time.time(),))
+
+    def close(self):
+        self._executor.submit(self._close).result()
+        self._executor.shutdown()
+
+    def _close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
@@ -0,0 +1,115 @@
+import typing
+from collections import Counter
+
+
+class _TrieNode:
+    __slots__ = ("children", "entries")
+
+    def __init__(self):
+        self.children: typing.Dict[str, _TrieNode] = {}
+        self.entries: typing.List[typing.Tuple[str, str]] = []
+
+
+def ngrams(text, n=3) -> typing.Set[str]:
+    padded = f" {text} "
+    return set(padded[i:i + n] for i in range(max(len(padded) - n + 1, 1)))
+
+
+class FlagSearchIndex:
+    """in memory index of flag names answering prefix and fuzzy queries without touching the retrievers"""
+
+    def __init__(self, n=3, min_similarity=0.2):
+        self.n = n
+        self.min_similarity = min_similarity
+
+        self._root = _TrieNode()
+        self._ngrams: typing.Dict[str, typing.Set[typing.Tuple[str, str]]] = {}
+        self._ngram_counts: typing.Dict[typing.Tuple[str, str], int] = {}
+
+    def __len__(self):
+        return len(self._ngram_counts)
+
+    def rebuild(self, entries: typing.Iterable[typing.Tuple[str, str]]):
+        """replaces the index with (schema, name) entries; readers keep seeing the old index until it's done"""
+        root = _TrieNode()
+        grams = {}
+        counts = {}
+
+        for schema, name in entries:
+            entry = (schema, name)
+
+            if entry in counts:
+                continue
+
+            node = root
+            for letter in name.lower():
+                node = node.children.setdefault(letter, _TrieNode())
+            node.entries.append(entry)
+
+            name_grams = ngrams(name.lower(), self.n)
+            counts[entry] = len(name_grams)
+
+            for gram in name_grams:
+                grams.setdefault(gram, set()).add(entry)
+
+        self._root, self._ngrams, self._ngram_counts = root, grams, counts
+
+    def prefixed(self, prefix, schema=None, limit=25) -> typing.List[str]:
+        node = self._root
+
+        for letter in prefix.lower():
+            node = node.children.get(letter, None)
+
+            if node is None:
+                return []
+
+        ret = []
+        # breadth first so shorter names come first
+        level = [node]
+
+        while level and len(ret) < limit:
+            next_level = []
+
+            for current in level:
+                ret.extend(name for entry_schema, name in current.entries
+                           if schema is None or entry_schema == schema)
+                next_level.extend(current.children[letter] for letter in sorted(current.children))
+
+            level = next_level
+
+        return ret[:limit]
+
+    def fuzzy(self, query, schema=None, limit=25) -> typing.List[str]:
+        query_grams = ngrams(query.lower(), self.n)
+        shared = Counter()
+
+        for gram in query_grams:
+            for entry in self._ngrams.get(gram, ()):
+                if schema is None or entry[0] == schema:
+                    shared[entry] += 1
+
+        scored = []
+
+        for entry, count in shared.items():
+            # jaccard similarity of the n-gram sets
+            similarity = count / (len(query_grams) + self._ngram_counts[entry] - count)
+
+            if similarity >= self.min_similarity:
+                scored.append((-similarity, entry[1]))
+
+        scored.sort()
+        return [name for _, name in scored[:limit]]
+
+    def search(self, query, schema=None, limit=25) -> typing.List[str]:
+        query = query.strip()
+
+        if len(query) == 0:
+            return self.prefixed("", schema, limit)
+
+        ret = self.prefixed(query, schema, limit)
+
+        if len(ret) < limit:
+            seen = set(ret)
+            ret.extend(name for name in self.fuzzy(query, schema, limit) if name not in seen)
+
+        return ret[:limit]
@@ -0,0 +1,68 @@
+import asyncio
+import typing
+import urllib.parse
+
+import aiohttp
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+T = typing.TypeVar("T")
+
+
+class HTTPClient:
+    """pooled outbound http; one keep-alive session per host, created lazily inside the running loop"""
+
+    def __init__(self, *, limit_per_host=4, timeout=15, retries=2, backoff=0.5, keepalive_timeout=30):
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.keepalive_timeout = keepalive_timeout
+
+        self._sessions: typing.Dict[str, aiohttp.ClientSession] = {}
+
+    def session(self, url) -> aiohttp.ClientSession:
+        host = urllib.parse.urlsplit(url).netloc
+        session = self._sessions.get(host, None)
+
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=self.keepalive_timeout,
+                                             ttl_dns_cache=300)
+            session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._sessions[host] = session
+
+        return session
+
+    async def fetch(self, url, reader: typing.Callable[[aiohttp.ClientResponse], typing.Awaitable[T]]) -> T:
+        session = self.session(url)
+
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+
+            try:
+                async with session.get(url) as response:
+                    if response.status not in RETRY_STATUSES or last_attempt:
+                        return await reader(response)
+
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if last_attempt:
+                    raise
+
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def read(self, url) -> bytes:
+        return await self.fetch(url, aiohttp.ClientResponse.read)
+
+    async def json(self, url) -> typing.Any:
+        return await self.fetch(url, aiohttp.ClientResponse.json)
+
+    async def close(self):
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+
+        for session in sessions:
+            await session.close()
+
+
+client = HTTPClient()
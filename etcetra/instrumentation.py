@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+import typing
+from collections import deque
+
+
+class LoopLagMonitor:
+    """measures how late the event loop wakes up a sleeping task, i.e. how long callbacks hold the loop"""
+
+    def __init__(self, interval=0.5, window=240):
+        self.interval = interval
+        self.samples: typing.Deque[float] = deque(maxlen=window)
+        self.worst = 0
+
+        self._task: typing.Optional[asyncio.Task] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop = None):
+        if self._task is None:
+            self._task = (loop or asyncio.get_event_loop()).create_task(self._sample())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - start - self.interval, 0)
+
+            self.samples.append(lag)
+            self.worst = max(self.worst, lag)
+
+    def summary(self) -> typing.Dict[str, float]:
+        """lag in seconds over the window: mean, 99th percentile and maximum, plus the worst ever seen"""
+        if not self.samples:
+            return {"mean": 0, "p99": 0, "max": 0, "worst": self.worst}
+
+        ordered = sorted(self.samples)
+
+        return {
+            "mean": sum(ordered) / len(ordered),
+            "p99": ordered[min(int(len(ordered) * 0.99), len(ordered) - 1)],
+            "max": ordered[-1],
+            "worst": self.worst,
+        }
+
+
+class _Timing:
+    __slots__ = ("calls", "total", "worst")
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0
+        self.worst = 0
+
+
+class ExecutorStats:
+    """queued and running jobs of an executor, with the time spent in each function it ran"""
+
+    def __init__(self, name):
+        self.name = name
+
+        self.queued = 0
+        self.running = 0
+        self.timings: typing.Dict[str, _Timing] = {}
+
+        self._lock = threading.Lock()
+
+    def run_in_executor(self, loop: asyncio.AbstractEventLoop, executor, func, name=None) -> asyncio.Future:
+        """runs func in executor, counting it as queued until it starts and as running until it returns;
+        a job cancelled before it starts leaves the queue count too"""
+        name = name or getattr(func, "__qualname__", None) or repr(func)
+        # whichever of the job and the done callback comes first takes the job off the queue count
+        dequeued = False
+
+        def dequeue():
+            nonlocal dequeued
+
+            if not dequeued:
+                dequeued = True
+                self.queued -= 1
+
+        def job():
+            with self._lock:
+                dequeue()
+                self.running += 1
+
+            start = time.perf_counter()
+
+            try:
+                return func()
+
+            finally:
+                elapsed = time.perf_counter() - start
+
+                with self._lock:
+                    self.running -= 1
+                    timing = self.timings.setdefault(name, _Timing())
+                    timing.calls += 1
+                    timing.total += elapsed
+                    timing.worst = max(timing.worst, elapsed)
+
+        def done(_):
+            with self._lock:
+                dequeue()
+
+        with self._lock:
+            self.queued += 1
+
+        try:
+            future = loop.run_in_executor(executor, job)
+
+        except BaseException:
+            done(None)
+            raise
+
+        future.add_done_callback(done)
+        return future
+
+    def slowest(self, count=5) -> typing.List[typing.Tuple[str, _Timing]]:
+        with self._lock:
+            return sorted(self.timings.items(), key=lambda item: item[1].total, reverse=True)[:count]
+
+
+loop_lag = LoopLagMonitor()
+executors: typing.Dict[str, ExecutorStats] = {}
+
+
+def track_executor(name) -> ExecutorStats:
+    return executors.setdefault(name, ExecutorStats(name))
+
+
+def summary_line() -> str:
+    """one line for the log"""
+    lag = loop_lag.summary()
+    parts = [f"loop lag mean {lag['mean'] * 1000:.1f}ms p99 {lag['p99'] * 1000:.1f}ms max {lag['max'] * 1000:.1f}ms"]
+
+    for stats in executors.values():
+        parts.append(f"{stats.name} {stats.running} running {stats.queued} queued")
+
+    return ", ".join(parts)
+
+
+def report(timings=5) -> str:
+    """multi-line breakdown, including the functions executors spent most time in"""
+    lag = loop_lag.summary()
+    lines = [f"loop lag: mean {lag['mean'] * 1000:.1f}ms, p99 {lag['p99'] * 1000:.1f}ms, "
+             f"max {lag['max'] * 1000:.1f}ms, worst since start {lag['worst'] * 1000:.1f}ms"]
+
+    for stats in executors.values():
+        lines.append(f"{stats.name}: {stats.running} running, {stats.queued} queued")
+
+        for name, timing in stats.slowest(timings):
+            lines.append(f"    {name}: {timing.calls} calls, {timing.total / timing.calls * 1000:.1f}ms mean, "
+                         f"{timing.worst * 1000:.1f}ms worst")
+
+    return "\n".join(lines)
@@ -1,4 +1,5 @@
 import asyncio
+import traceback
 from abc import ABC, abstractmethod
 from contextlib import suppress
 from functools import wraps
@@ -7,62 +8,10 @@ from typing import Dict, Any, Optional, Iterable
 import nextcord
 
 from etcetra.human_join_list import human_join_list
-
-
-def process_render_changes(o: dict, n: dict) -> Dict[str, Any]:
-    ret = {}
-    for key in o:
-        ret[key] = None
-
-    for key, val in n.items():
-        other_value = o.get(key, None)
-
-        if isinstance(val, nextcord.Embed) and isinstance(other_value, nextcord.Embed):
-            is_equal = other_value.to_dict() == val.to_dict()
-        elif not isinstance(val, nextcord.Embed) and not isinstance(other_value, nextcord.Embed):
-            is_equal = val == other_value
-        else:
-            is_equal = False
-
-        if is_equal:
-            del ret[key]
-        else:
-            ret[key] = val
-    return ret
-
-
-async def sync_reactions(message: nextcord.Message, reactions: Iterable[str]):
-    message = await message.channel.fetch_message(message.id)  # get updated message
-    message: nextcord.Message
-
-    message_reactions = message.reactions
-
-    message_reaction_idx = 0
-
-    for new_reaction in reactions:
-        if message_reaction_idx < len(message_reactions):
-            while message_reaction_idx < len(message_reactions) and \
-                    new_reaction != message_reactions[message_reaction_idx].emoji:
-                await message.clear_reaction(message_reactions[message_reaction_idx])
-                message_reaction_idx += 1
-
-        if message_reaction_idx >= len(message_reactions) or not message_reactions[message_reaction_idx].me:
-            await message.add_reaction(new_reaction)
-
-        message_reaction_idx += 1
-
-    while message_reaction_idx < len(message_reactions):
-        await message.clear_reaction(message_reactions[message_reaction_idx])
-        message_reaction_idx += 1
-
-
-async def send_reactions(message: nextcord.Message, reactions: Iterable[str]):
-    message = await message.channel.fetch_message(message.id)
-
-    for reaction in reactions:
-        message_reaction = nextcord.utils.get(message.reactions, emoji=reaction)
-        if message_reaction is None or not message_reaction.me:
-            await message.add_reaction(reaction)
+from .permission_watch import PermissionWatch
+from .reactions import ReactionState, apply_reactions
+from .router import ReactiveMessageRouter
+from .snapshot import RenderSnapshot, process_render_changes
 
 
 def format_permissions(perms):
@@ -90,7 +39,7 @@ def checks_updates(function=None, *, always=False):
             async with self.lock:
                 should_update = await func(self, *args, **kwargs)
                 if should_update or always:
-                    await self.update()
+                    self.request_update()
 
         return wrapper
 
@@ -102,13 +51,18 @@ def checks_updates(function=None, *, always=False):
 
 class ReactiveMessage(ABC):
     ENFORCE_REACTION_POSITIONS = True
+    # minimum seconds between coalesced updates; discord allows about five edits per five seconds per channel
+    UPDATE_INTERVAL = 1
 
     def __init__(self, bot, channel):
         self.bot = bot
 
         self.channel: nextcord.TextChannel = channel
 
-        self.bound_message: Optional[nextcord.Message] = None
+        self.router = ReactiveMessageRouter.of(bot)
+        self.permission_watch = PermissionWatch.of(bot)
+        self._bound_message: Optional[nextcord.Message] = None
+        self.reaction_state = ReactionState()  # reactions on the bound message
 
         self.current_displaying_render = None  # what is absolutely rendered to nextcord
         self.message_render = None
@@ -122,17 +76,35 @@ class ReactiveMessage(ABC):
 
         self.lock = asyncio.Lock()
 
-        self.bot.add_listener_object(self)
+        self._dirty = False  # the state changed since the last update
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_update = 0
+
+        self.router.register(self)
 
         asyncio.get_running_loop().create_task(self.send())
 
+    @property
+    def bound_message(self) -> Optional[nextcord.Message]:
+        return self._bound_message
+
+    @bound_message.setter
+    def bound_message(self, message: Optional[nextcord.Message]):
+        self.router.rebind(self, self._bound_message, message)
+        self._bound_message = message
+        self.reaction_state = ReactionState()
+
     @abstractmethod
     def render_message(self) -> Dict[str, Any]:
         raise NotImplementedError
 
+    def handled_events(self) -> Iterable[str]:
+        """the event names on_event should be called for; call router.refresh when they change"""
+        return ()
+
     async def send(self):
         message_kwargs = await nextcord.utils.maybe_coroutine(self.render_message)
-        await self.send_from_dict(message_kwargs)
+        await self.send_from_dict(RenderSnapshot(message_kwargs))
 
     # noinspection PyArgumentList
     async def wait_permissions_fulfill(self, changes: dict, send_first_attempt=False):
@@ -149,27 +121,8 @@ class ReactiveMessage(ABC):
             else:
                 await method(dict(content=format_permissions(s)))
 
-                def check_channel(channel):
-                    return channel.id == self.channel.id
-
-                def check_guild(guild):
-                    return guild.id == self.channel.guild.id
-
-                def check_user(user):
-                    return user.id == self.bot.user.id
-
-                pending_tasks = [
-                    self.bot.wait_for('guild_channel_update', check=lambda before, after: check_channel(after)),
-                    self.bot.wait_for('guild_role_update', check=lambda before, after: check_guild(after.guild)),
-                    self.bot.wait_for('member_update', check=lambda before, after: check_user(after))]
-
-                done_tasks, pending_tasks = await asyncio.wait(pending_tasks, return_when=asyncio.FIRST_COMPLETED,
-                                                               timeout=30)
-
-                for task in pending_tasks:
-                    task.cancel()
-
-                if len(done_tasks) == 0:
+                # woken once another permission check would pass
+                if not await self.permission_watch.wait(self.channel, self.get_required_permissions(changes)):
                     await self.delete()
                     return
             send_first_attempt = False
@@ -185,8 +138,9 @@ class ReactiveMessage(ABC):
         if self.bound_message is not None:
             to_delete = self.bound_message
 
-        self.current_displaying_render = d.copy()
-        reactions = d.pop("reactions", None)
+        # snapshots are never modified, so there's no need for a copy
+        self.current_displaying_render = RenderSnapshot.of(d)
+        reactions = d.get("reactions", None)
 
         self.bound_message = await self.channel.send(**_strip_only_message(d))
 
@@ -195,11 +149,44 @@ class ReactiveMessage(ABC):
             # the old message is called now because of the cog possibly removing this instance from this
 
         if reactions is not None:
-            await send_reactions(self.bound_message, reactions)
+            await apply_reactions(self.bound_message, self.reaction_state, reactions, reorder=False)
+
+    def request_update(self):
+        """schedules an update; requests arriving before it runs are folded into it"""
+        self._dirty = True
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush())
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+
+        try:
+            while self._dirty and self.running:
+                delay = self._last_update + self.UPDATE_INTERVAL - loop.time()
+
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                try:
+                    async with self.lock:
+                        # renders whatever the state is now, skipping the states in between
+                        self._dirty = False
+                        await self.update()
+
+                except Exception:
+                    # nobody awaits this task; the next request schedules a fresh attempt
+                    print(f"could not update {type(self).__name__} in channel {self.channel.id}:")
+                    traceback.print_exc()
+
+                self._last_update = loop.time()
+
+        finally:
+            self._flush_task = None
 
     async def update(self):
         message_kwargs = await nextcord.utils.maybe_coroutine(self.render_message)
-        await self.update_from_dict(message_kwargs)
+        await self.update_from_dict(RenderSnapshot(message_kwargs))
 
     async def update_from_dict(self, d):
         await self.wait_permissions_fulfill(d, False)
@@ -207,9 +194,7 @@ class ReactiveMessage(ABC):
         self.message_render = d
 
     def check_permissions(self, perms):
-        guild = self.channel.guild
-        me = guild.me if guild is not None else self.bot.user
-        permissions = self.channel.permissions_for(me)
+        permissions = self.permission_watch.permissions_for(self.channel)
 
         return [perm for perm, value in perms.items() if getattr(permissions, perm) != value]
 
@@ -230,6 +215,7 @@ class ReactiveMessage(ABC):
         return permissions
 
     async def _update_from_dict(self, d: dict):
+        d = RenderSnapshot.of(d)
         changes = process_render_changes(self.current_displaying_render, d)
 
         guild = self.channel.guild
@@ -244,8 +230,10 @@ class ReactiveMessage(ABC):
             if new_reactions is None:
                 new_reactions = ()
 
-            if len(changes) > 0:  # not just the reactions changed
-                await self.bound_message.edit(**_strip_only_message(changes))
+            message_changes = _strip_only_message(changes)
+
+            if len(message_changes) > 0:  # the message itself changed, not just reactions or groups
+                await self.bound_message.edit(**message_changes)
 
             if reactions_changed:  # if the reactions changed
                 reaction_group_changed = "reaction_group" in changes
@@ -253,20 +241,23 @@ class ReactiveMessage(ABC):
                 try:
                     if not reaction_group_changed and "reaction_group" in self.current_displaying_render:
                         if permissions.manage_messages and permissions.add_reactions:
-                            await sync_reactions(self.bound_message, new_reactions)
+                            await apply_reactions(self.bound_message, self.reaction_state, new_reactions)
                         elif permissions.add_reactions:
-                            await send_reactions(self.bound_message, new_reactions)
+                            await apply_reactions(self.bound_message, self.reaction_state, new_reactions,
+                                                  reorder=False)
                             reaction_re_sync_required = True
                         else:
                             reaction_re_sync_required = True
                     else:
                         if permissions.manage_messages:
                             await self.bound_message.clear_reactions()
+                            self.reaction_state.cleared()
                         else:
                             reaction_re_sync_required = True
 
                         if permissions.add_reactions:
-                            await send_reactions(self.bound_message, new_reactions)
+                            await apply_reactions(self.bound_message, self.reaction_state, new_reactions,
+                                                  reorder=False)
                         else:
                             reaction_re_sync_required = True
 
@@ -274,9 +265,8 @@ class ReactiveMessage(ABC):
                     reaction_re_sync_required = True
 
         if reaction_re_sync_required:
-            message = await self.channel.fetch_message(self.bound_message.id)
-
-            d["reactions"] = [reaction.emoji for reaction in message.reactions]
+            # what is actually on the message, as tracked from the gateway
+            d = d.replace(reactions=self.reaction_state.emojis())
 
         self.current_displaying_render = d
 
@@ -317,7 +307,7 @@ class ReactiveMessage(ABC):
 
     async def remove(self):
         if self.running:
-            self.bot.remove_listener_object(self)
+            self.router.unregister(self)
 
             self.running = False
 
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Union, Tuple, Type
+from typing import Dict, Any, Union, Tuple, Type, FrozenSet
 
 from .ReactiveMessage import ReactiveMessage, checks_updates
 
@@ -42,6 +43,13 @@ class Page(ABC):
         pass
 
 
+@functools.lru_cache()
+def page_events(page: Type[Page]) -> FrozenSet[str]:
+    """the events a page has an on_<event> handler for; the hooks every page has aren't events"""
+    return frozenset(name[3:] for name in dir(page)
+                     if name.startswith("on_") and not hasattr(Page, name) and callable(getattr(page, name)))
+
+
 class Route:
     def __init__(self):
         self.routes = {}
@@ -152,6 +160,8 @@ class RoutedReactiveMessage(ReactiveMessage):
         self._current_route = self.route
         self._current_args = route_args
 
+        self.router.refresh(self)
+
     async def render_message(self) -> Dict[str, Any]:
         await self.change_page()
 
@@ -167,6 +177,9 @@ class RoutedReactiveMessage(ReactiveMessage):
 
         return await self._current_page.process_reaction_add(reaction, user)
 
+    def handled_events(self):
+        return page_events(type(self._current_page))
+
     @checks_updates
     async def on_event(self, event_name, *args, **kwargs):
         method = f"on_{event_name}"
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import typing
+
+_watches = {}
+
+
+class _Waiter:
+    __slots__ = ("channel", "required", "future", "touched")
+
+    def __init__(self, channel, required: typing.Dict[str, bool], future: asyncio.Future):
+        self.channel = channel
+        self.required = required
+        self.future = future
+        self.touched = False  # a relevant event happened without satisfying the requirements
+
+
+class PermissionWatch:
+    """one set of listeners per bot for messages waiting on channel permissions
+
+    waiters are grouped by (guild, channel); on a relevant gateway event the bot's permissions are computed
+    once per affected channel and only the waiters they satisfy are woken"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+        self.waiters: typing.Dict[typing.Tuple[typing.Optional[int], int], typing.List[_Waiter]] = {}
+        self.by_guild: typing.Dict[typing.Optional[int], typing.Set[int]] = {}
+
+        bot.add_listener_object(self)
+
+    @classmethod
+    def of(cls, bot) -> PermissionWatch:
+        watch = _watches.get(bot, None)
+
+        if watch is None:
+            watch = _watches[bot] = cls(bot)
+
+        return watch
+
+    def permissions_for(self, channel):
+        guild = channel.guild
+        me = guild.me if guild is not None else self.bot.user
+        return channel.permissions_for(me)
+
+    @staticmethod
+    def _key(channel):
+        guild = getattr(channel, "guild", None)
+        return None if guild is None else guild.id, channel.id
+
+    async def wait(self, channel, required: typing.Dict[str, bool], *, timeout=30) -> bool:
+        """waits until the bot has the required permissions in channel; False if timeout seconds pass
+        without any event that could have changed them"""
+        waiter = _Waiter(channel, required, asyncio.get_running_loop().create_future())
+        key = self._key(channel)
+
+        self.waiters.setdefault(key, []).append(waiter)
+        self.by_guild.setdefault(key[0], set()).add(key[1])
+
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+                    return True
+
+                except asyncio.TimeoutError:
+                    if not waiter.touched:
+                        return False
+
+                    waiter.touched = False
+
+        finally:
+            self._remove(key, waiter)
+
+    def _remove(self, key, waiter):
+        waiters = self.waiters.get(key, None)
+
+        if waiters is None or waiter not in waiters:
+            return
+
+        waiters.remove(waiter)
+
+        if not waiters:
+            del self.waiters[key]
+
+            channels = self.by_guild[key[0]]
+            channels.discard(key[1])
+
+            if not channels:
+                del self.by_guild[key[0]]
+
+    def _recheck(self, key, channel=None):
+        waiters = self.waiters.get(key, None)
+
+        if not waiters:
+            return
+
+        permissions = self.permissions_for(channel or waiters[0].channel)
+
+        for waiter in waiters:
+            if waiter.future.done():
+                continue
+
+            if all(getattr(permissions, perm) == value for perm, value in waiter.required.items()):
+                waiter.future.set_result(None)
+
+            else:
+                waiter.touched = True
+
+    def _recheck_guild(self, guild_id):
+        for channel_id in list(self.by_guild.get(guild_id, ())):
+            self._recheck((guild_id, channel_id))
+
+    async def on_guild_channel_update(self, before, after):
+        self._recheck((after.guild.id, after.id), after)
+
+    async def on_guild_role_update(self, before, after):
+        self._recheck_guild(after.guild.id)
+
+    async def on_member_update(self, before, after):
+        if after.id == self.bot.user.id:
+            self._recheck_guild(after.guild.id)
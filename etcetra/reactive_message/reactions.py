@@ -0,0 +1,104 @@
+import typing
+from collections import OrderedDict
+
+import nextcord
+
+
+class _Entry:
+    __slots__ = ("me", "others")
+
+    def __init__(self):
+        self.me = False
+        self.others = 0
+
+
+class ReactionState:
+    """reactions of a bound message in display order, kept current from gateway events and our own calls
+
+    every update is idempotent for our own reaction, so the gateway echo of a call already applied is harmless"""
+
+    def __init__(self):
+        self._entries: typing.OrderedDict[str, _Entry] = OrderedDict()
+
+    def emojis(self) -> typing.List[str]:
+        return list(self._entries)
+
+    def mine(self, emoji) -> bool:
+        entry = self._entries.get(str(emoji), None)
+        return entry is not None and entry.me
+
+    def added(self, emoji, me):
+        entry = self._entries.setdefault(str(emoji), _Entry())
+
+        if me:
+            entry.me = True
+        else:
+            entry.others += 1
+
+    def removed(self, emoji, me):
+        key = str(emoji)
+        entry = self._entries.get(key, None)
+
+        if entry is None:
+            return
+
+        if me:
+            entry.me = False
+        else:
+            entry.others = max(entry.others - 1, 0)
+
+        if not entry.me and entry.others == 0:
+            del self._entries[key]
+
+    def cleared(self, emoji=None):
+        if emoji is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(str(emoji), None)
+
+
+class ReactionPlan(typing.NamedTuple):
+    clear: typing.List[str]
+    add: typing.List[str]
+
+
+def plan_reactions(state: ReactionState, reactions: typing.Iterable, *, reorder=True) -> ReactionPlan:
+    """fewest calls turning the message reactions into reactions
+
+    the longest prefix of reactions that already shows up in order is kept; everything else is cleared and
+    the rest is added behind it; without reorder nothing is cleared and only missing reactions are added"""
+    desired = [str(reaction) for reaction in reactions]
+    current = state.emojis()
+
+    if not reorder:
+        return ReactionPlan([], [emoji for emoji in desired if not state.mine(emoji)])
+
+    clear = []
+    add = []
+    matched = 0
+
+    for emoji in current:
+        # greedy matching finds the longest prefix that is a subsequence of the current reactions
+        if matched < len(desired) and emoji == desired[matched]:
+            if not state.mine(emoji):
+                add.append(emoji)
+            matched += 1
+
+        else:
+            clear.append(emoji)
+
+    add.extend(desired[matched:])
+    return ReactionPlan(clear, add)
+
+
+async def apply_reactions(message: nextcord.Message, state: ReactionState, reactions: typing.Iterable, *,
+                          reorder=True):
+    plan = plan_reactions(state, reactions, reorder=reorder)
+
+    for emoji in plan.clear:
+        await message.clear_reaction(emoji)
+        state.cleared(emoji)
+
+    for emoji in plan.add:
+        await message.add_reaction(emoji)
+        state.added(emoji, True)
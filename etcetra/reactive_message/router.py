@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import typing
+
+if typing.TYPE_CHECKING:
+    from .ReactiveMessage import ReactiveMessage
+
+_routers = {}
+
+
+class ReactiveMessageRouter:
+    """one set of listeners per bot that hands events only to the reactive messages they concern
+
+    messages are indexed by channel id, by the id of their bound message and by the generic events they currently
+    handle, which they refresh when that changes"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+        self.by_channel: typing.Dict[int, typing.Set[ReactiveMessage]] = {}
+        self.by_message: typing.Dict[int, ReactiveMessage] = {}
+        self.by_event: typing.Dict[str, typing.Set[ReactiveMessage]] = {}
+        self.instances: typing.Dict[ReactiveMessage, typing.FrozenSet[str]] = {}  # instance -> handled events
+
+        bot.add_listener_object(self)
+
+    @classmethod
+    def of(cls, bot) -> ReactiveMessageRouter:
+        router = _routers.get(bot, None)
+
+        if router is None:
+            router = _routers[bot] = cls(bot)
+
+        return router
+
+    def register(self, instance: ReactiveMessage):
+        self.instances[instance] = frozenset()
+        self.by_channel.setdefault(instance.channel.id, set()).add(instance)
+        self.refresh(instance)
+
+    def refresh(self, instance: ReactiveMessage):
+        """reindexes the generic events instance handles"""
+        old = self.instances.get(instance, None)
+
+        if old is None:
+            return
+
+        new = frozenset(instance.handled_events())
+        self.instances[instance] = new
+
+        for event_name in old - new:
+            self._unindex_event(event_name, instance)
+
+        for event_name in new - old:
+            self.by_event.setdefault(event_name, set()).add(instance)
+
+    def _unindex_event(self, event_name, instance):
+        instances = self.by_event.get(event_name, None)
+
+        if instances is not None:
+            instances.discard(instance)
+
+            if not instances:
+                del self.by_event[event_name]
+
+    def rebind(self, instance: ReactiveMessage, old, new):
+        if old is not None and self.by_message.get(old.id, None) is instance:
+            del self.by_message[old.id]
+
+        if new is not None and instance in self.instances:
+            self.by_message[new.id] = instance
+
+    def unregister(self, instance: ReactiveMessage):
+        for event_name in self.instances.pop(instance, ()):
+            self._unindex_event(event_name, instance)
+
+        channel = self.by_channel.get(instance.channel.id, None)
+
+        if channel is not None:
+            channel.discard(instance)
+
+            if not channel:
+                del self.by_channel[instance.channel.id]
+
+        self.rebind(instance, instance.bound_message, None)
+
+    @staticmethod
+    async def _gather(calls):
+        # each instance used to be its own listener, so one failing doesn't stop the others
+        for result in await asyncio.gather(*calls, return_exceptions=True):
+            if isinstance(result, Exception):
+                raise result
+
+    async def on_message(self, message):
+        await self._gather([instance.on_message(message) for instance in self.by_channel.get(message.channel.id, ())])
+
+    async def on_reaction_add(self, reaction, user):
+        instance = self.by_message.get(reaction.message.id, None)
+
+        if instance is not None:
+            await instance.on_reaction_add(reaction, user)
+
+    async def on_message_delete(self, message):
+        instance = self.by_message.get(message.id, None)
+
+        if instance is not None:
+            await instance.on_message_delete(message)
+
+    async def on_bulk_message_delete(self, messages):
+        instances = set(filter(None, (self.by_message.get(message.id, None) for message in messages)))
+
+        await self._gather([instance.on_bulk_message_delete(messages) for instance in instances])
+
+    def _reaction_state(self, payload):
+        instance = self.by_message.get(payload.message_id, None)
+        return None if instance is None else instance.reaction_state
+
+    async def on_raw_reaction_add(self, payload):
+        state = self._reaction_state(payload)
+
+        if state is not None:
+            state.added(payload.emoji, payload.user_id == self.bot.user.id)
+
+    async def on_raw_reaction_remove(self, payload):
+        state = self._reaction_state(payload)
+
+        if state is not None:
+            state.removed(payload.emoji, payload.user_id == self.bot.user.id)
+
+    async def on_raw_reaction_clear(self, payload):
+        state = self._reaction_state(payload)
+
+        if state is not None:
+            state.cleared()
+
+    async def on_raw_reaction_clear_emoji(self, payload):
+        state = self._reaction_state(payload)
+
+        if state is not None:
+            state.cleared(payload.emoji)
+
+    async def on_event(self, event_name, *args, **kwargs):
+        await self._gather([instance.on_event(event_name, *args, **kwargs)
+                            for instance in self.by_event.get(event_name, ())])
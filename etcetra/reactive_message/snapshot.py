@@ -0,0 +1,98 @@
+import typing
+from collections.abc import Mapping
+
+import nextcord
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(val)) for key, val in value.items()))
+
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(val) for val in value)
+
+    try:
+        hash(value)
+
+    except TypeError:
+        return repr(value)
+
+    return value
+
+
+class RenderSnapshot(Mapping):
+    """a rendered message with the hash of every value, computed once when it's rendered
+
+    embeds are hashed per top level field of their dict form, so changes can be narrowed down to those fields"""
+
+    def __init__(self, render: typing.Mapping[str, typing.Any], *, _hashes=None, _embed=None):
+        self._render = dict(render)
+
+        if _embed is None:
+            embed = self._render.get("embed", None)
+            _embed = embed.to_dict() if isinstance(embed, nextcord.Embed) else None
+
+        self.embed_dict: typing.Optional[dict] = _embed
+        self.embed_hashes: typing.Dict[str, int] = {} if _embed is None else \
+            {key: hash(_freeze(value)) for key, value in _embed.items()}
+
+        self.hashes: typing.Dict[str, int] = dict(_hashes or {})
+
+        for key, value in self._render.items():
+            if key not in self.hashes:
+                self.hashes[key] = self._hash(key, value)
+
+    def _hash(self, key, value):
+        if key == "embed" and self.embed_dict is not None:
+            return hash(("embed", tuple(sorted(self.embed_hashes.items()))))
+
+        return hash(_freeze(value))
+
+    @classmethod
+    def of(cls, render: typing.Mapping[str, typing.Any]) -> "RenderSnapshot":
+        return render if isinstance(render, RenderSnapshot) else cls(render)
+
+    def __getitem__(self, key):
+        return self._render[key]
+
+    def __iter__(self):
+        return iter(self._render)
+
+    def __len__(self):
+        return len(self._render)
+
+    def replace(self, **values) -> "RenderSnapshot":
+        """a copy with some values replaced; only those are hashed again"""
+        if "embed" in values:
+            return RenderSnapshot({**self._render, **values})
+
+        hashes = {key: value for key, value in self.hashes.items() if key not in values}
+        return RenderSnapshot({**self._render, **values}, _hashes=hashes, _embed=self.embed_dict)
+
+
+def process_render_changes(o: typing.Mapping, n: typing.Mapping) -> typing.Dict[str, typing.Any]:
+    """values of n that differ from o, and None for keys that only o has"""
+    o = RenderSnapshot.of(o)
+    n = RenderSnapshot.of(n)
+
+    ret = dict.fromkeys(key for key in o if key not in n)
+
+    for key, val in n.items():
+        if o.hashes.get(key, None) != n.hashes[key] or key not in o:
+            ret[key] = val
+
+    return ret
+
+
+def process_embed_changes(o: typing.Mapping, n: typing.Mapping) -> typing.Dict[str, typing.Any]:
+    """the top level embed fields that changed between renders, in dict form; None for removed fields"""
+    o = RenderSnapshot.of(o)
+    n = RenderSnapshot.of(n)
+
+    ret = dict.fromkeys(key for key in o.embed_hashes if key not in n.embed_hashes)
+
+    for key, value_hash in n.embed_hashes.items():
+        if o.embed_hashes.get(key, None) != value_hash or key not in o.embed_hashes:
+            ret[key] = n.embed_dict[key]
+
+    return ret
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import time
+import typing
+
+# runs inside the render worker processes, which unpickle jobs by reference to this module and etcetra.scenery;
+# neither may import the bot, its cogs or anything holding shared state such as the disk caches
+_progress_queue = None
+
+
+class RenderTooLarge(Exception):
+    """the output grew past the size limit before the scene finished"""
+    pass
+
+
+def warm_up(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    # pay the import cost once per worker instead of on the first render it receives
+    import PIL.Image
+    import PIL.ImageDraw
+    import PIL.ImageStat
+    import reportlab.graphics.renderPM
+    import render.execute
+    import render.scene
+    import etcetra.scenery
+
+    PIL.Image.init()
+
+
+def ping():
+    return os.getpid()
+
+
+def render_job(job_id, description, size_limit, progress_interval) -> typing.Tuple[str, bool]:
+    from render.execute import run_scene
+
+    last_report = 0
+    oversized = False
+
+    def callback(io, t):
+        nonlocal last_report, oversized
+
+        # the size of the buffer rather than the position, which moves if the encoder seeks back to patch a header
+        with io.getbuffer() as view:
+            size = view.nbytes
+
+        now = time.monotonic()
+
+        if now - last_report >= progress_interval:
+            last_report = now
+            _progress_queue.put((job_id, size, t))
+
+        oversized = size >= size_limit
+        return not oversized
+
+    scene = description.build()
+
+    try:
+        io, animated = run_scene(scene, callback=callback)
+
+    except RuntimeError:
+        scene.cleanup_objects()
+
+        if oversized:
+            # run_scene signals the abort with a plain RuntimeError, which is too broad to hand back
+            raise RenderTooLarge(f"the output passed {size_limit} bytes") from None
+
+        raise
+
+    # the upload streams from this file instead of the whole output being pickled back through the pipe
+    fd, path = tempfile.mkstemp(prefix="render-", suffix=".gif" if animated else ".png")
+
+    try:
+        with os.fdopen(fd, "wb") as fp, io.getbuffer() as view:
+            fp.write(view)
+
+    except BaseException:
+        os.remove(path)
+        raise
+
+    finally:
+        io.close()
+
+    return path, animated
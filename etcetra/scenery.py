@@ -0,0 +1,333 @@
+from __future__ import annotations
+
+import abc
+import dataclasses
+import enum
+import math
+import typing
+from io import BytesIO
+from typing import TYPE_CHECKING
+
+from PIL import Image, ImageChops, ImageSequence
+from render.scene import Scene
+
+if TYPE_CHECKING:
+    from render.objects.image import ImageComponent
+
+
+@dataclasses.dataclass(frozen=True)
+class Quality:
+    fps: typing.Optional[int] = None  # caps the scene fps
+    scale: float = 1
+    colors: int = 256
+
+    def __str__(self):
+        details = []
+
+        if self.fps is not None:
+            details.append(f"{self.fps}fps")
+
+        if self.scale != 1:
+            details.append(f"{round(self.scale * 100)}% size")
+
+        if self.colors < 256:
+            details.append(f"{self.colors} colors")
+
+        return ", ".join(details) or "full quality"
+
+
+class SceneCost(typing.NamedTuple):
+    pixels: int
+    seconds: float
+    fps: int
+    animated: bool
+
+    def units(self, quality: Quality) -> float:
+        """proportional to the encoded size; pixels per frame times frames times bits per pixel"""
+        frames = 1
+
+        if self.animated:
+            fps = self.fps if quality.fps is None else min(self.fps, quality.fps)
+            frames = max(self.seconds * fps, 1)
+
+        return self.pixels * quality.scale ** 2 * frames * math.log2(quality.colors) / 8
+
+
+# gif delays are whole centiseconds and most viewers play a delay under two as ten, so faster scenes only cost frames
+MAX_FPS = 50
+
+
+class RotateDirection(enum.Enum):
+    NO = enum.auto()
+    CLOCKWISE = enum.auto()
+    COUNTERCLOCKWISE = enum.auto()
+
+
+class FlagOverlayScene(Scene):
+    def __init__(self, user_image, mask, flag_image, *, rotate: RotateDirection = RotateDirection.NO, fps=60):
+        super().__init__()
+
+        self.flag_image = flag_image
+        self.mask = mask
+        self.user_image = user_image
+
+        self.rotate = rotate
+        self.min_frame_duration = 1 / fps
+
+    def lifecycle(self, t) -> typing.Union[typing.Optional[float], typing.Generator[float, float, float]]:
+        flag = self.create_image(self.flag_image)
+        mask = self.create_image(self.mask)
+        user: ImageComponent = self.create_image(self.user_image)
+
+        self.width = user.width
+        self.height = user.height
+
+        flag.mask = mask
+        flag.mask_channel = "R"
+        flag.local_mask = False
+
+        flag.transform.anchor = (flag.width / 2, flag.width / 2)
+        flag.transform.position = (self.width / 2, self.height / 2)
+
+        self.draw_object(user)
+        self.draw_object(flag)
+
+        if self.rotate != RotateDirection.NO:
+            duration = 3
+
+            if user.animated:
+                duration = user.duration
+
+            self.create_tween("linear", flag.defer.transform.angle, duration=duration, begin_value=0,
+                              end_value=math.tau if self.rotate == RotateDirection.COUNTERCLOCKWISE else -math.tau)
+
+        return 0
+
+
+class HelicopterScene(Scene):
+    def __init__(self, user_image, *, fps=60):
+        super().__init__()
+
+        self.user_image = user_image
+        self.min_frame_duration = 1 / fps
+
+    def lifecycle(self, t) -> typing.Union[typing.Optional[float], typing.Generator[float, float, float]]:
+        image: ImageComponent = self.create_image(self.user_image)
+
+        image.transform.anchor = (image.width / 2, image.height / 2)
+        image.transform.scale = (100 / image.width, 100 / image.height)
+
+        image.image_resample = Image.BICUBIC
+
+        self.draw_object(image)
+
+        self.width = 400
+        self.height = 400
+
+        image.transform.position = (200, 350)
+
+        self.create_tween("easeInQuad", image.defer.transform.angle, duration=4, begin_value=0,
+                          end_value=math.pi * 50)
+
+        yield 4
+
+        self.create_tween("linear", image.defer.transform.angle, duration=10, begin_value=0,
+                          end_value=math.pi * 50 * 14 / 4)
+
+        def pos_y(v):
+            image.transform.position = (image.transform.position[0], v)
+
+        self.create_tween("easeInOutQuad", pos_y, duration=10, begin_value=350, end_value=80)
+
+        yield 5
+
+        def pos_x(v):
+            image.transform.position = (v, image.transform.position[1])
+
+        self.create_tween("easeInQuad", pos_x, duration=5, begin_value=200, end_value=450)
+
+        return 0
+
+
+def open_scaled(data: bytes, scale=1, colors=256) -> Image.Image:
+    """opens an image, downscaling and reducing the palette of every frame if asked to
+
+    every frame is mapped onto the palette of the first one, which is cheaper than quantizing each and keeps
+    unchanged areas from flickering between palettes"""
+    image = Image.open(BytesIO(data))
+
+    if scale == 1 and colors >= 256:
+        return image
+
+    size = (max(int(image.width * scale), 1), max(int(image.height * scale), 1))
+    palette = None
+    frames = []
+    durations = []
+
+    for frame in ImageSequence.Iterator(image):
+        duration = frame.info.get("duration", image.info.get("duration", 100))
+        frame = frame.convert("RGBA").resize(size, Image.LANCZOS)
+
+        if colors < 256:
+            if palette is None:
+                palette = frame.convert("RGB").quantize(colors, method=Image.FASTOCTREE)
+
+            # undithered, so identical pixels stay identical from frame to frame
+            quantized = frame.convert("RGB").quantize(palette=palette, dither=Image.NONE).convert("RGBA")
+            quantized.putalpha(frame.getchannel("A"))
+            frame = quantized
+
+        frames.append(frame)
+        durations.append(duration)
+
+    if len(frames) == 1:
+        return frames[0]
+
+    io = BytesIO()
+    frames[0].save(io, "GIF", save_all=True, append_images=frames[1:], duration=durations, loop=0, disposal=2)
+    io.seek(0)
+    return Image.open(io)
+
+
+def change_durations(image: Image.Image) -> typing.List[int]:
+    """milliseconds each run of identical consecutive frames of an animated image is shown for"""
+    durations = []
+    previous = None
+
+    for frame in ImageSequence.Iterator(image):
+        duration = frame.info.get("duration", image.info.get("duration", 100))
+        pixels = frame.convert("RGBA").tobytes()
+
+        if pixels == previous:
+            durations[-1] += duration
+
+        else:
+            durations.append(duration)
+            previous = pixels
+
+    image.seek(0)
+    return durations
+
+
+def change_rate(image: Image.Image, fps) -> float:
+    """the lowest frame rate, up to fps, that still samples every change of an animated image
+
+    frames land on multiples of the greatest common divisor of the durations, so each change is drawn once
+    instead of being repeated in every frame until the next one"""
+    step = math.gcd(*change_durations(image))
+
+    if step == 0:
+        return fps
+
+    return min(fps, 1000 / step)
+
+
+def scaled(image: Image.Image, scale):
+    if scale == 1:
+        return image
+
+    return image.resize((max(int(image.width * scale), 1), max(int(image.height * scale), 1)), Image.LANCZOS)
+
+
+class SceneDescription(abc.ABC):
+    """picklable recipe of a scene; the scene itself is only built inside the render worker"""
+
+    @abc.abstractmethod
+    def build(self) -> Scene:
+        pass
+
+    @abc.abstractmethod
+    def estimate_cost(self) -> SceneCost:
+        pass
+
+    @abc.abstractmethod
+    def with_quality(self, quality: Quality) -> SceneDescription:
+        pass
+
+    def render_still(self) -> typing.Optional[bytes]:
+        """PNG output of a scene without animation, drawn without building the scene; None if unsupported"""
+        return None
+
+
+@dataclasses.dataclass(frozen=True)
+class FlagOverlaySceneDescription(SceneDescription):
+    user_image: bytes
+    mask: Image.Image
+    flag_image: Image.Image
+    rotate: RotateDirection = RotateDirection.NO
+    fps: int = 60
+    scale: float = 1
+    colors: int = 256
+
+    def build(self) -> FlagOverlayScene:
+        user_image = open_scaled(self.user_image, self.scale, self.colors)
+        fps = min(self.fps, MAX_FPS)
+
+        if self.rotate == RotateDirection.NO and getattr(user_image, "is_animated", False):
+            # nothing but the avatar moves, so frames only have to change when its frames do
+            fps = change_rate(user_image, fps)
+
+        return FlagOverlayScene(user_image, scaled(self.mask, self.scale), scaled(self.flag_image, self.scale),
+                                rotate=self.rotate, fps=fps)
+
+    def estimate_cost(self) -> SceneCost:
+        image = Image.open(BytesIO(self.user_image))
+        pixels = image.width * image.height
+        fps = min(self.fps, MAX_FPS)
+
+        if getattr(image, "is_animated", False):
+            seconds = image.n_frames * image.info.get("duration", 100) / 1000
+
+            if self.rotate == RotateDirection.NO:
+                # at most one frame per avatar frame, see build
+                fps = min(fps, image.n_frames / seconds) if seconds > 0 else fps
+
+            return SceneCost(pixels, seconds, fps, True)
+
+        if self.rotate != RotateDirection.NO:
+            return SceneCost(pixels, 3, fps, True)
+
+        return SceneCost(pixels, 0, fps, False)
+
+    def render_still(self) -> typing.Optional[bytes]:
+        if self.estimate_cost().animated:
+            return None
+
+        user = Image.open(BytesIO(self.user_image)).convert("RGBA")
+        flag = self.flag_image.convert("RGBA")
+        mask = self.mask if self.mask.mode == "L" else self.mask.getchannel("R")
+
+        # same placement as the scene; the flag anchor is (width / 2, width / 2)
+        layer = Image.new("RGBA", user.size, (0, 0, 0, 0))
+        layer.paste(flag, (int(user.width / 2 - flag.width / 2), int(user.height / 2 - flag.width / 2)))
+
+        # the scene mask scales the flag alpha instead of replacing it
+        layer.putalpha(ImageChops.multiply(layer.getchannel("A"), mask))
+        output = Image.alpha_composite(user, layer)
+
+        io = BytesIO()
+        output.save(io, "PNG")
+        return io.getvalue()
+
+    def with_quality(self, quality: Quality) -> FlagOverlaySceneDescription:
+        return dataclasses.replace(self, fps=self.fps if quality.fps is None else min(self.fps, quality.fps),
+                                   scale=quality.scale, colors=quality.colors)
+
+
+@dataclasses.dataclass(frozen=True)
+class HelicopterSceneDescription(SceneDescription):
+    user_image: bytes
+    fps: int = 60
+    colors: int = 256
+
+    def build(self) -> HelicopterScene:
+        return HelicopterScene(open_scaled(self.user_image, colors=self.colors), fps=min(self.fps, MAX_FPS))
+
+    def estimate_cost(self) -> SceneCost:
+        # fixed canvas and timeline
+        return SceneCost(400 * 400, 19, min(self.fps, MAX_FPS), True)
+
+    def with_quality(self, quality: Quality) -> HelicopterSceneDescription:
+        # the canvas has a fixed size, so the scale is left out
+        return dataclasses.replace(self, fps=self.fps if quality.fps is None else min(self.fps, quality.fps),
+                                   colors=quality.colors)
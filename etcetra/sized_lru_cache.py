@@ -0,0 +1,82 @@
+import threading
+import time
+import typing
+from collections import OrderedDict
+
+K = typing.TypeVar("K")
+V = typing.TypeVar("V")
+
+
+class SizedLRUCache(typing.Generic[K, V]):
+    """least recently used mapping bounded by the summed size of its values
+
+    entries can optionally expire after ttl seconds; it's safe to use from executor threads"""
+
+    def __init__(self, max_size, *, sizeof: typing.Callable[[V], int] = len, ttl=None):
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.ttl = ttl
+
+        self.size = 0
+
+        self._entries: typing.OrderedDict[K, typing.Tuple[V, int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key: K, default=None) -> typing.Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key, None)
+
+            if entry is None:
+                return default
+
+            value, _, expires = entry
+
+            if expires < time.monotonic():
+                self._remove(key)
+                return default
+
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: K, value: V, *, ttl=None):
+        size = self.sizeof(value)
+
+        if size > self.max_size:
+            # would evict everything just to be evicted itself
+            return
+
+        ttl = self.ttl if ttl is None else ttl
+        expires = float("inf") if ttl is None else time.monotonic() + ttl
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (value, size, expires)
+            self.size += size
+
+            while self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def pop(self, key: K, default=None) -> typing.Optional[V]:
+        with self._lock:
+            if key not in self._entries:
+                return default
+
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        value, size, _ = self._entries.pop(key)
+        self.size -= size
+        return value
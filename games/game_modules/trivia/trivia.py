@@ -2,9 +2,9 @@ import base64
 import math
 import random
 
-import aiohttp
 import nextcord
 
+from etcetra.http_client import client
 from games.Game import EndGame
 from games.GameHasTimeout import GameWithTimeout
 from games.GamePlayer import GamePlayer
@@ -65,14 +65,13 @@ class TriviaGame(GameWithTimeout):
             player.points = self.settings["initial_barrier_span"]
 
     async def fetch_question(self):
-        async with aiohttp.request("GET", f"https://opentdb.com/api.php?amount=1"
-                                          f"&token={self.trivia_token}&encode=base64") as response:
-            self.trivia_question = decode_data((await response.json())["results"][0])
+        response = await client.json(f"https://opentdb.com/api.php?amount=1"
+                                     f"&token={self.trivia_token}&encode=base64")
+        self.trivia_question = decode_data(response["results"][0])
 
     async def on_start(self):
         await super(TriviaGame, self).on_start()
-        async with aiohttp.request("GET", "https://opentdb.com/api_token.php?command=request") as response:
-            self.trivia_token = (await response.json())["token"]
+        self.trivia_token = (await client.json("https://opentdb.com/api_token.php?command=request"))["token"]
 
         await self.start_round()
 
@@ -8,6 +8,9 @@ from nextcord import PartialEmoji
 from nextcord.ext import commands
 from nextcord.message import convert_emoji_reaction
 
+from etcetra.http_client import client as http_client
+from etcetra.instrumentation import loop_lag
+
 try:
     with open("config.json") as f:
         t = json.loads(f.read())
@@ -41,9 +44,17 @@ class DiscordBot(commands.Bot):
                 self.load_extension(f"cogs.{line}")
                 print(f"loaded {line}")
 
+        loop_lag.start(self.loop)
+
     async def on_ready(self):
         await self.change_presence(activity=nextcord.Game(name=f"prefix {self.command_prefix}command"))
 
+    async def close(self):
+        loop_lag.stop()
+        await super().close()
+        # the shared client of every outbound request that isn't the discord api
+        await http_client.close()
+
     def dispatch(self, event_name, *args, **kwargs):
         super().dispatch("event", event_name, *args, **kwargs)
         super().dispatch(event_name, *args, **kwargs)